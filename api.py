@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+import audit_log
+import metrics
+import model_registry
+import prediction_cache
+import sensitivity
+import validation
+
+DEFAULT_PORT = 8502
+MAX_BATCH_SIZE = 256
+MAX_BATCH_DELAY = 0.002  # seconds a request may wait for others to join its batch
+
+
+class RequestError(ValueError):
+    pass
+
+
+def _to_json_scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def parse_row(payload, feature_names):
+    """Turn one JSON instance into a feature row in the model's column order.
+
+    An instance is either an object keyed by feature name or a list of values
+    already in feature order.
+    """
+    if isinstance(payload, dict):
+        missing = [name for name in feature_names if name not in payload]
+        if missing:
+            raise RequestError(f"missing feature(s): {', '.join(missing)}")
+        values = [payload[name] for name in feature_names]
+    elif isinstance(payload, list):
+        if len(payload) != len(feature_names):
+            raise RequestError(f"expected {len(feature_names)} values, got {len(payload)}")
+        values = payload
+    else:
+        raise RequestError("each instance must be an object or a list")
+    try:
+        return [float(value) for value in values]
+    except (TypeError, ValueError):
+        raise RequestError("feature values must be numbers") from None
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row requests into one vectorized scorer call.
+
+    Rows are batched per model entry: each request is scored by the entry it
+    read (and keyed its cache and audit record on), even if a new model is
+    swapped in while it waits. The first request to arrive opens a batch and
+    schedules a flush ``max_delay`` seconds later; an entry's batch is flushed
+    early once it reaches ``max_batch_size`` rows.
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_delay=MAX_BATCH_DELAY):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending = {}  # entry -> (rows, futures)
+        self._timer = None
+        self.batches = 0
+        self.rows = 0
+
+    def submit(self, entry, row):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        rows, futures = self._pending.setdefault(entry, ([], []))
+        rows.append(row)
+        futures.append(future)
+        if len(rows) >= self.max_batch_size:
+            self._score(entry, *self._pending.pop(entry))
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self.flush)
+        return future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        for entry, (rows, futures) in pending.items():
+            self._score(entry, rows, futures)
+
+    def _score(self, entry, rows, futures):
+        try:
+            predictions, probabilities = entry.scorer.predict(np.array(rows, dtype=np.float64))
+        except Exception as e:
+            metrics.inc("prediction_errors_total", len(futures), source="api")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(rows)
+        for i, future in enumerate(futures):
+            if not future.done():
+                probability = None if probabilities is None else float(probabilities[i])
+                future.set_result((_to_json_scalar(predictions[i]), probability))
+
+
+async def _read_json(request):
+    try:
+        return json.loads(await request.body())
+    except ValueError:
+        raise RequestError("request body must be valid JSON") from None
+
+
+def _error(message, status_code=400, **extra):
+    return JSONResponse({"error": message, **extra}, status_code=status_code)
+
+
+def _invalid(check):
+    # 422: well-formed JSON whose values are outside what the model accepts
+    return _error("invalid feature values", 422, errors=check.errors()[0])
+
+
+async def predict(request):
+    start = time.perf_counter()
+    entry = model_registry.get_entry()
+    try:
+        row = parse_row(await _read_json(request), entry.scorer.feature_names)
+    except RequestError as e:
+        return _error(str(e))
+    check = validation.validate(row, entry.scorer.feature_names)
+    if not check.all_valid:
+        metrics.inc("rejected_rows_total", source="api")
+        return _invalid(check)
+    key = (entry.sha256, prediction_cache.normalize(row))
+    result = prediction_cache.cache.get(key)
+    if result is None:
+        result = await request.app.state.batcher.submit(entry, row)
+        prediction_cache.cache.put(key, result)
+    prediction, probability = result
+    latency = time.perf_counter() - start
+    metrics.observe("api_predict", latency)
+    metrics.inc("predictions_total", source="api")
+    record_id = audit_log.record_prediction(dict(zip(entry.scorer.feature_names, row)), prediction,
+                                            probability, entry.version, latency * 1e3, source="api")
+    return JSONResponse({"prediction": _to_json_scalar(prediction), "probability": probability,
+                         "id": record_id})
+
+
+async def predict_batch(request):
+    """Score a list of instances. Invalid instances don't fail the request: they
+    get a null prediction and are listed under ``errors`` by index."""
+    try:
+        payload = await _read_json(request)
+        instances = payload.get("instances") if isinstance(payload, dict) else payload
+        if not isinstance(instances, list) or not instances:
+            raise RequestError("expected a non-empty list of instances")
+    except RequestError as e:
+        return _error(str(e))
+    entry = model_registry.get_entry()
+    scorer = entry.scorer
+    n_features = len(scorer.feature_names)
+    X = np.empty((len(instances), n_features), dtype=np.float64)
+    malformed = {}
+    for i, instance in enumerate(instances):
+        try:
+            X[i] = parse_row(instance, scorer.feature_names)
+        except RequestError as e:
+            X[i] = np.nan
+            malformed[i] = [str(e)]
+    check = validation.validate(X, scorer.feature_names)
+    errors = {**check.errors(), **malformed} if not check.all_valid else {}
+    valid = np.flatnonzero(check.valid)
+
+    predictions = [None] * len(instances)
+    probabilities = [None] * len(instances)
+    start = time.perf_counter()
+    if len(valid):
+        scored, scored_probabilities = scorer.predict(X[valid])
+        for k, i in enumerate(valid.tolist()):
+            predictions[i] = _to_json_scalar(scored[k])
+            if scored_probabilities is not None:
+                probabilities[i] = float(scored_probabilities[k])
+    # Every row shares the latency of the vectorized call it was scored in
+    latency_ms = (time.perf_counter() - start) * 1e3
+    metrics.observe("api_predict_batch", latency_ms / 1e3)
+    metrics.inc("predictions_total", len(valid), source="api_batch")
+    if errors:
+        metrics.inc("rejected_rows_total", len(errors), source="api_batch")
+    ids = [None] * len(instances)
+    for i in valid.tolist():
+        ids[i] = audit_log.record_prediction(dict(zip(scorer.feature_names, X[i].tolist())), predictions[i],
+                                             probabilities[i], entry.version, latency_ms, source="api_batch")
+    response = {
+        "predictions": predictions,
+        "probabilities": probabilities if hasattr(entry.model, "predict_proba") else None,
+        "ids": ids,
+    }
+    if errors:
+        response["errors"] = {str(i): messages for i, messages in sorted(errors.items())}
+    return JSONResponse(response)
+
+
+async def sweep(request):
+    """Risk curve for one feature over its input range, the others held at ``instance``."""
+    entry = model_registry.get_entry()
+    scorer = entry.scorer
+    try:
+        payload = await _read_json(request)
+        if not isinstance(payload, dict):
+            raise RequestError("expected an object with 'instance' and 'feature'")
+        row = parse_row(payload.get("instance"), scorer.feature_names)
+        feature = payload.get("feature")
+        if feature not in scorer.feature_names:
+            raise RequestError(f"unknown feature {feature!r}")
+        points = payload.get("points", sensitivity.CURVE_POINTS)
+        if not isinstance(points, int) or not 2 <= points <= 1001:
+            raise RequestError("points must be an integer between 2 and 1001")
+    except RequestError as e:
+        return _error(str(e))
+    check = validation.validate(row, scorer.feature_names)
+    if not check.all_valid:
+        return _invalid(check)
+    if not hasattr(entry.model, "predict_proba"):
+        return _error("the active model has no probabilities to sweep", 409)
+    grid, probabilities = sensitivity.risk_curve(scorer, entry.sha256, row,
+                                                 scorer.feature_names.index(feature), points)
+    return JSONResponse({"feature": feature, "grid": grid.tolist(), "probabilities": probabilities.tolist()})
+
+
+async def metrics_endpoint(request):
+    if not metrics.enabled:
+        return PlainTextResponse("metrics are disabled; set DIABETES_METRICS=1\n", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def health(request):
+    entry = model_registry.get_entry()
+    scorer = entry.scorer
+    return JSONResponse({
+        "status": "ok",
+        "model_version": entry.version,
+        "scorer": scorer.kind,
+        "features": list(scorer.feature_names),
+        "prediction_cache": prediction_cache.cache.stats(),
+    })
+
+
+def make_app(batcher=None):
+    """Build the ASGI app. Test it in-process with ``starlette.testclient.TestClient``."""
+    app = Starlette(routes=[
+        Route("/predict", predict, methods=["POST"]),
+        Route("/predict/batch", predict_batch, methods=["POST"]),
+        Route("/sweep", sweep, methods=["POST"]),
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", metrics_endpoint, methods=["GET"]),
+    ])
+    app.state.batcher = batcher if batcher is not None else MicroBatcher()
+    return app
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve diabetes risk predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    # Load and warm the model before accepting traffic
+    model_registry.get_entry()
+    uvicorn.run(make_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
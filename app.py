@@ -1,11 +1,22 @@
 import streamlit as st
-import pickle
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-from PIL import Image
 import io
-import base64
+import time
+
+import audit_log
+import metrics
+import model_registry
+import prediction_cache
+import prewarm
+import sensitivity
+import session_store
+import validation
+from config import AUDIT_LOG_ENABLED, LIVE_PREVIEW, METRICS_PORT
+from features import FEATURE_BOUNDS, model_feature_names
+
+# pandas-backed modules (charts, batch_scoring) are imported where
+# they are first used; prewarm loads them in the background after first paint.
 
 # Set page configuration
 st.set_page_config(
@@ -15,207 +26,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Load the trained model
+# Get the active model (loaded once per process; new versions are swapped in in the background)
 try:
-    with open('diabetes_model.pkl', 'rb') as file:
-        model = pickle.load(file)
+    model_entry = model_registry.get_entry()
+    model = model_entry.model
+    scorer = model_entry.scorer
+    explainer = model_entry.explainer
 except FileNotFoundError:
-    st.error("Model file not found. Please ensure 'diabetes_model.pkl' exists in the root directory.")
+    st.error("Model file not found. Please ensure 'diabetes_model.lrmodel' or 'diabetes_model.pkl' "
+             "exists in the root directory.")
     st.stop()
 
-# Custom CSS for styling
-st.markdown("""
-    <style>
-        /* Main theme */
-        :root {
-            --primary: #5B21B6;
-            --primary-light: #8B5CF6;
-            --secondary: #10B981;
-            --accent: #F59E0B;
-            --background: #F3F4F6;
-            --card: #FFFFFF;
-            --text: #1F2937;
-            --error: #EF4444;
-            --success: #10B981;
-        }
-        
-        /* Base styles */
-        body {
-            font-family: 'Inter', sans-serif;
-            background-color: var(--background);
-            color: var(--text);
-        }
-        
-        .stApp {
-            background: linear-gradient(135deg, #EEF2FF 0%, #F3F4F6 100%);
-        }
-        
-        /* Card styling */
-        .card {
-            background: var(--card);
-            border-radius: 16px;
-            padding: 25px;
-            margin-bottom: 20px;
-            box-shadow: 0 10px 15px -3px rgba(0, 0, 0, 0.05), 0 4px 6px -2px rgba(0, 0, 0, 0.03);
-            border: 1px solid rgba(209, 213, 219, 0.3);
-        }
-        
-        /* Input fields */
-        .stNumberInput > div > div > input {
-            border-radius: 8px;
-            border: 1px solid #E5E7EB;
-            padding: 10px 14px;
-            transition: all 0.3s ease;
-        }
-        
-        .stNumberInput > div > div > input:focus {
-            border-color: var(--primary-light);
-            box-shadow: 0 0 0 2px rgba(139, 92, 246, 0.2);
-        }
-        
-        /* Buttons */
-        .stButton>button {
-            background: linear-gradient(135deg, var(--primary) 0%, var(--primary-light) 100%);
-            color: white;
-            font-size: 1.1em;
-            font-weight: 600;
-            border-radius: 10px;
-            padding: 12px 28px;
-            border: none;
-            box-shadow: 0 4px 12px rgba(91, 33, 182, 0.15);
-            transition: all 0.3s ease;
-            width: 100%;
-            margin-top: 10px;
-        }
-        
-        .stButton>button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 15px rgba(91, 33, 182, 0.25);
-        }
-        
-        /* Headers */
-        h1 {
-            color: var(--primary);
-            font-weight: 800;
-            font-size: 2.5rem;
-            margin-bottom: 1rem;
-        }
-        
-        h2 {
-            font-size: 1.5rem;
-            font-weight: 700;
-            margin-bottom: 1rem;
-        }
-        
-        h3 {
-            font-size: 1.2rem;
-            font-weight: 600;
-            color: var(--primary);
-        }
-        
-        /* Results */
-        .prediction-box {
-            padding: 20px;
-            border-radius: 12px;
-            text-align: center;
-            margin-top: 10px;
-            font-weight: 600;
-            font-size: 1.2rem;
-            transition: all 0.5s ease;
-        }
-        
-        .positive {
-            background-color: rgba(239, 68, 68, 0.1);
-            border: 1px solid var(--error);
-            color: var(--error);
-        }
-        
-        .negative {
-            background-color: rgba(16, 185, 129, 0.1);
-            border: 1px solid var(--success);
-            color: var(--success);
-        }
-        
-        /* Helper text */
-        .helper-text {
-            font-size: 0.85rem;
-            color: #6B7280;
-            margin-top: -10px;
-            margin-bottom: 10px;
-        }
-        
-        /* Progress bar */
-        .stProgress > div > div > div {
-            background-color: var(--primary-light);
-        }
-        
-        /* Tabs */
-        .stTabs [data-baseweb="tab-list"] {
-            gap: 8px;
-        }
-        
-        .stTabs [data-baseweb="tab"] {
-            height: 50px;
-            border-radius: 8px 8px 0 0;
-            padding: 10px 20px;
-            background-color: #F9FAFB;
-        }
-        
-        .stTabs [aria-selected="true"] {
-            background-color: white !important;
-            border-bottom: 2px solid var(--primary) !important;
-        }
-        
-        /* Tooltips */
-        .tooltip {
-            position: relative;
-            display: inline-block;
-            cursor: help;
-            color: var(--primary);
-        }
-        
-        /* Sidebar */
-        [data-testid="stSidebar"] {
-            background-color: #F8FAFC;
-            border-right: 1px solid #E2E8F0;
-            padding-top: 2rem;
-        }
-        
-        /* Info cards */
-        .info-card {
-            background-color: rgba(139, 92, 246, 0.05);
-            border-left: 4px solid var(--primary);
-            padding: 15px;
-            border-radius: 8px;
-            margin-bottom: 20px;
-        }
-        
-        /* Metrics */
-        [data-testid="stMetric"] {
-            background-color: white;
-            padding: 15px;
-            border-radius: 10px;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-        }
-        
-        /* Divider */
-        hr {
-            margin: 2rem 0;
-            border: 0;
-            height: 1px;
-            background: #E5E7EB;
-        }
-    </style>
-""", unsafe_allow_html=True)
+# Custom CSS for styling. The stylesheet is served from static/ (see
+# .streamlit/config.toml), so the browser fetches and caches it once and each
+# rerun only re-sends this one-line import instead of the whole stylesheet.
+st.html('<style>@import url("app/static/styles.css");</style>')
 
-# Function to create a download link for the chart
-def get_image_download_link(fig, filename, text):
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-    buf.seek(0)
-    img_str = base64.b64encode(buf.read()).decode()
-    href = f'<a href="data:image/png;base64,{img_str}" download="{filename}">📊 {text}</a>'
-    return href
+# Key for this browser session's entry in the shared session store
+def get_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
 
 def main():
     # Sidebar for navigation and information
@@ -238,7 +68,27 @@ def main():
         """)
         
         st.markdown("### Data Privacy")
-        st.markdown("Your data is processed locally and not stored on any server.")
+        if AUDIT_LOG_ENABLED:
+            st.markdown("Each assessment's inputs and result are recorded on this server, under "
+                        "the Assessment ID shown with the result, for auditing and analytics.")
+        else:
+            st.markdown("Your data is processed on this server and not stored.")
+        
+        st.markdown("### Model")
+        st.markdown(f"Active version: `{model_entry.version}`")
+        
+        # Developer panel with hot-path timings (only when DIABETES_METRICS=1)
+        if metrics.enabled:
+            with st.expander("🛠️ Developer Metrics"):
+                snapshot = metrics.snapshot()
+                st.dataframe({
+                    "Phase": list(snapshot["phases"]),
+                    "Calls": [p["count"] for p in snapshot["phases"].values()],
+                    "Mean (ms)": [round(p["mean_ms"], 3) for p in snapshot["phases"].values()],
+                }, hide_index=True)
+                st.dataframe({"Counter": list(snapshot["counters"]),
+                              "Value": list(snapshot["counters"].values())}, hide_index=True)
+                st.caption(f"Prometheus: http://127.0.0.1:{METRICS_PORT}/metrics")
         
         if st.button("Learn More About Diabetes"):
             st.markdown("""
@@ -257,7 +107,7 @@ def main():
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Create tabs for organization
-    tab1, tab2, tab3 = st.tabs(["📝 Input Data", "📊 Risk Analysis", "ℹ️ Help"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📝 Input Data", "📊 Risk Analysis", "📁 Batch Scoring", "ℹ️ Help"])
     
     with tab1:
         st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -267,22 +117,22 @@ def main():
         with col1:
             st.markdown("### Personal Information")
             age = st.number_input("Age (years)", 
-                                min_value=0, 
-                                max_value=120, 
+                                min_value=FEATURE_BOUNDS["Age"][0], 
+                                max_value=FEATURE_BOUNDS["Age"][1], 
                                 value=30,
                                 help="Your current age in years")
             st.markdown('<div class="helper-text">Age is a key factor in diabetes risk</div>', unsafe_allow_html=True)
             
             pregnancies = st.number_input("Number of Pregnancies", 
-                                        min_value=0, 
-                                        max_value=20, 
+                                        min_value=FEATURE_BOUNDS["Pregnancies"][0], 
+                                        max_value=FEATURE_BOUNDS["Pregnancies"][1], 
                                         value=0,
                                         help="Number of times pregnant (0 for males)")
             st.markdown('<div class="helper-text">For women only - enter 0 if male</div>', unsafe_allow_html=True)
             
             diabetes_pedigree_function = st.number_input("Diabetes Pedigree Function", 
-                                                        min_value=0.0, 
-                                                        max_value=2.5, 
+                                                        min_value=FEATURE_BOUNDS["DiabetesPedigreeFunction"][0], 
+                                                        max_value=FEATURE_BOUNDS["DiabetesPedigreeFunction"][1], 
                                                         value=0.5, 
                                                         format="%.3f",
                                                         help="A function that scores likelihood of diabetes based on family history")
@@ -291,32 +141,32 @@ def main():
         with col2:
             st.markdown("### Health Metrics")
             glucose = st.number_input("Glucose Level (mg/dL)", 
-                                    min_value=0, 
-                                    max_value=300, 
+                                    min_value=FEATURE_BOUNDS["Glucose"][0], 
+                                    max_value=FEATURE_BOUNDS["Glucose"][1], 
                                     value=100,
                                     help="Blood glucose concentration after 2-hour oral glucose tolerance test")
             
             blood_pressure = st.number_input("Blood Pressure (mm Hg)", 
-                                            min_value=0, 
-                                            max_value=200, 
+                                            min_value=FEATURE_BOUNDS["BloodPressure"][0], 
+                                            max_value=FEATURE_BOUNDS["BloodPressure"][1], 
                                             value=70,
                                             help="Diastolic blood pressure")
             
             skin_thickness = st.number_input("Skin Thickness (mm)", 
-                                            min_value=0, 
-                                            max_value=100, 
+                                            min_value=FEATURE_BOUNDS["SkinThickness"][0], 
+                                            max_value=FEATURE_BOUNDS["SkinThickness"][1], 
                                             value=20,
                                             help="Triceps skin fold thickness")
             
             insulin = st.number_input("Insulin Level (μU/mL)", 
-                                    min_value=0, 
-                                    max_value=850, 
+                                    min_value=FEATURE_BOUNDS["Insulin"][0], 
+                                    max_value=FEATURE_BOUNDS["Insulin"][1], 
                                     value=80,
                                     help="2-Hour serum insulin")
             
             bmi = st.number_input("BMI (kg/m²)", 
-                                min_value=0.0, 
-                                max_value=70.0, 
+                                min_value=FEATURE_BOUNDS["BMI"][0], 
+                                max_value=FEATURE_BOUNDS["BMI"][1], 
                                 value=25.0,
                                 format="%.1f",
                                 help="Body Mass Index")
@@ -339,12 +189,26 @@ def main():
                 
                 st.markdown(f'<div style="color:{bmi_color};font-weight:bold;">BMI Status: {bmi_status}</div>', unsafe_allow_html=True)
         
-        # Validation for required fields
-        required_fields = [glucose, blood_pressure, bmi, age]
-        is_valid = all(field > 0 for field in required_fields)
+        # Collect input features
+        features = np.array([[pregnancies, glucose, blood_pressure, skin_thickness,
+                            insulin, bmi, diabetes_pedigree_function, age]])
+        
+        # Same range checks as batch files and the API
+        with metrics.timer("input_validation"):
+            check = validation.validate(features, scorer.feature_names)
+            is_valid = check.all_valid
         
         if not is_valid:
-            st.warning("Please fill in all required fields with valid values (greater than 0).")
+            st.warning("Please fill in all required fields with valid values:\n" +
+                       "\n".join(f"- {message}" for message in check.errors()[0]))
+        elif LIVE_PREVIEW:
+            # Updates on every edit from lookup tables; Predict runs the exact model
+            with metrics.timer("live_preview"):
+                estimate = model_entry.preview.probability_row(features[0].tolist())
+            if estimate is not None:
+                margin = f" ± {model_entry.preview.max_error * 100:.1f}" if model_entry.preview.max_error else ""
+                st.markdown(f'<div class="helper-text">Live risk estimate: <b>{estimate * 100:.1f}%</b>{margin} '
+                            '(click Predict for the full assessment)</div>', unsafe_allow_html=True)
         
         predict_btn = st.button("Predict Diabetes Risk", disabled=not is_valid)
         st.markdown('</div>', unsafe_allow_html=True)
@@ -353,39 +217,36 @@ def main():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### Diabetes Risk Analysis")
         
-        if 'prediction_made' not in st.session_state:
-            st.session_state.prediction_made = False
-            st.session_state.prediction_result = None
-            st.session_state.prediction_probability = None
-            st.session_state.features = None
+        # Results live in the compact process-wide store rather than st.session_state
+        session_id = get_session_id()
         
         # Predict button was clicked
         if predict_btn:
             with st.spinner('Analyzing your data...'):
-                # Collect input features
-                features = np.array([[pregnancies, glucose, blood_pressure, skin_thickness,
-                                    insulin, bmi, diabetes_pedigree_function, age]])
-                st.session_state.features = features
-                
                 try:
-                    # Make prediction
-                    prediction = model.predict(features)
-                    st.session_state.prediction_result = prediction[0]
-                    
-                    # Get probability if available
-                    if hasattr(model, 'predict_proba'):
-                        probabilities = model.predict_proba(features)
-                        st.session_state.prediction_probability = probabilities[0][1]  # Probability of class 1
-                    else:
-                        st.session_state.prediction_probability = None
+                    # Make prediction (repeat inputs are served from the shared prediction cache).
+                    # Probability is None for models without predict_proba.
+                    start = time.perf_counter()
+                    prediction, probability = prediction_cache.predict_one(model_entry, features[0])
+                    latency_ms = (time.perf_counter() - start) * 1e3
+                    metrics.observe("prediction", latency_ms / 1e3)
+                    metrics.inc("predictions_total", source="app")
+                    result = session_store.store.put(session_id, features[0], prediction, probability,
+                                                     model_entry.version)
                     
-                    st.session_state.prediction_made = True
+                    # Queued for the background audit writer; never blocks the rerun
+                    result.record_id = audit_log.record_prediction(dict(zip(scorer.feature_names, result.features)),
+                                                result.prediction, result.probability,
+                                                model_entry.version, latency_ms, source="app")
                 except Exception as e:
+                    metrics.inc("prediction_errors_total", source="app")
                     st.error(f"An error occurred during prediction: {e}")
         
+        result = session_store.store.get(session_id)
+        
         # Display prediction results if available
-        if st.session_state.prediction_made:
-            if st.session_state.prediction_result == 1:
+        if result is not None:
+            if result.prediction == 1:
                 st.markdown('<div class="prediction-box positive">'
                            '⚠️ Higher Risk: Based on the provided data, you may have an elevated risk of diabetes.'
                            '</div>', unsafe_allow_html=True)
@@ -395,12 +256,12 @@ def main():
                            '</div>', unsafe_allow_html=True)
             
             # Show probability if available
-            if st.session_state.prediction_probability is not None:
-                risk_percentage = st.session_state.prediction_probability * 100
+            if result.probability is not None:
+                risk_percentage = result.probability * 100
                 st.markdown(f"### Risk Score: {risk_percentage:.1f}%")
                 
                 # Progress bar for risk visualization
-                st.progress(st.session_state.prediction_probability)
+                st.progress(result.probability)
                 
                 # Risk level interpretation
                 if risk_percentage < 20:
@@ -415,6 +276,11 @@ def main():
                 
                 st.markdown(f'<h3 style="color:{color};">Risk Level: {risk_level}</h3>', unsafe_allow_html=True)
             
+            # Lets the outcome be reported later and matched to this prediction (Analytics page)
+            if result.record_id is not None:
+                st.markdown(f'<div class="helper-text">Assessment ID: <code>{result.record_id}</code></div>',
+                            unsafe_allow_html=True)
+            
             # Show feature importance visualization
             st.markdown("### Key Factors Analysis")
             
@@ -422,44 +288,71 @@ def main():
             feature_names = ['Pregnancies', 'Glucose', 'Blood Pressure', 'Skin Thickness', 
                            'Insulin', 'BMI', 'Diabetes Pedigree', 'Age']
             
-            feature_values = st.session_state.features[0]
-            
-            # Example importance values (normally would come from model)
-            # In a real app, you'd extract actual feature importances from your model
-            feature_importance = [0.05, 0.28, 0.07, 0.05, 0.10, 0.22, 0.08, 0.15]
-            
-            # Create a DataFrame for visualization
-            df = pd.DataFrame({
-                'Feature': feature_names,
-                'Value': feature_values,
-                'Importance': feature_importance
-            })
+            feature_values = result.features
             
-            # Sort by importance
-            df = df.sort_values('Importance', ascending=False)
+            import charts
             
-            # Plot feature importance
-            fig, ax = plt.subplots(figsize=(10, 6))
-            bars = ax.barh(df['Feature'], df['Importance'], color='#8B5CF6')
+            # Contribution of each input relative to an average patient (cached per input).
+            # Models without probabilities have none.
+            contributions = explainer.explain_row(feature_values) if result.probability is not None else None
             
-            # Add value labels to the bars
-            for i, (value, importance) in enumerate(zip(df['Value'], df['Importance'])):
-                ax.text(importance + 0.01, i, f'{value:.1f}', va='center')
-            
-            ax.set_xlabel('Relative Importance')
-            ax.set_title('Feature Importance for Diabetes Risk')
-            plt.tight_layout()
-            
-            st.pyplot(fig)
+            if contributions is None:
+                st.info("The active model doesn't report probabilities, so per-factor contributions "
+                        "aren't available.")
+            else:
+                # Drawn by the browser from eight rows of data instead of a server-rendered image
+                chart_args = (tuple(feature_names), feature_values, contributions, explainer.units)
+                st.vega_lite_chart(charts.contribution_frame(*chart_args[:3]),
+                                   charts.contribution_spec(explainer.units), width='stretch')
+                
+                # The high resolution PNG is only rendered when the download is clicked, then
+                # kept on disk and shared by every session asking for the same chart
+                st.download_button("📊 Download Feature Contributions Chart",
+                                   lambda: charts.export_chart_png(*chart_args),
+                                   file_name='feature_contributions.png',
+                                   mime='image/png')
             
-            # Add download link for the chart
-            st.markdown(get_image_download_link(fig, 'feature_importance.png', 'Download Feature Importance Chart'), 
-                      unsafe_allow_html=True)
+            # What-if analysis: sweep inputs over their ranges, holding the others fixed
+            if result.probability is not None:
+                import pandas as pd
+                
+                st.markdown("### What-If Analysis")
+                st.markdown("See how your risk would change if one or two of your values were different.")
+                
+                feature_labels = dict(enumerate(feature_names))
+                curve_index = st.selectbox("Vary one factor", list(feature_labels), index=1,
+                                           format_func=feature_labels.get)
+                grid, probabilities = sensitivity.risk_curve(scorer, model_entry.sha256,
+                                                             feature_values, curve_index)
+                curve = pd.DataFrame({'value': grid, 'risk': probabilities * 100})
+                st.vega_lite_chart(curve, charts.risk_curve_spec(feature_labels[curve_index]), width='stretch')
+                
+                col_x, col_y = st.columns(2)
+                with col_x:
+                    index_x = st.selectbox("Heatmap horizontal axis", list(feature_labels), index=1,
+                                           format_func=feature_labels.get)
+                with col_y:
+                    index_y = st.selectbox("Heatmap vertical axis", list(feature_labels), index=5,
+                                           format_func=feature_labels.get)
+                
+                if index_x != index_y:
+                    grid_x, grid_y, surface = sensitivity.risk_surface(
+                        scorer, model_entry.sha256, feature_values, index_x, index_y)
+                    mesh_x, mesh_y = np.meshgrid(grid_x, grid_y)
+                    # float32 halves the data sent to the browser. Grid steps are range/40,
+                    # which float32 holds exactly, and risk is still far finer than the colours.
+                    heatmap = pd.DataFrame({'x': mesh_x.ravel(), 'y': mesh_y.ravel(),
+                                            'risk': surface.ravel() * 100}).astype(np.float32)
+                    st.vega_lite_chart(heatmap, charts.risk_heatmap_spec(feature_labels[index_x],
+                                                                         feature_labels[index_y]),
+                                       width='stretch')
+                else:
+                    st.info("Choose two different factors to see the risk heatmap.")
             
             # Recommendations section
             st.markdown("### Recommendations")
             
-            if st.session_state.prediction_result == 1:
+            if result.prediction == 1:
                 st.markdown("""
                 Based on your results, consider:
                 
@@ -486,17 +379,56 @@ def main():
             
             # Action button
             if st.button("Reset Assessment"):
-                st.session_state.prediction_made = False
-                st.session_state.prediction_result = None
-                st.session_state.prediction_probability = None
-                st.session_state.features = None
-                st.experimental_rerun()
+                session_store.store.discard(session_id)
+                st.rerun()
         else:
             st.info("Enter your health data in the 'Input Data' tab and click 'Predict Diabetes Risk' to see your results here.")
             
         st.markdown('</div>', unsafe_allow_html=True)
             
     with tab3:
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.markdown("### Batch Scoring")
+        st.markdown("Upload a CSV or Parquet file with one patient per row to score them all at once. "
+                    "The file must contain the columns: " +
+                    ", ".join(f"`{name}`" for name in model_feature_names(model)))
+        
+        uploaded_file = st.file_uploader("Patient file", type=["csv", "parquet"])
+        include_contributions = st.checkbox("Include per-feature risk contributions")
+        
+        if uploaded_file is not None and st.button("Score File"):
+            import batch_scoring
+            
+            progress_text = st.empty()
+            output = io.BytesIO()
+            rejected_output = io.BytesIO()
+            try:
+                in_fmt = batch_scoring.detect_format(uploaded_file.name)
+                with st.spinner('Scoring patients...'):
+                    report = batch_scoring.score_stream(
+                        scorer, uploaded_file, output, in_fmt, in_fmt,
+                        explainer=explainer if include_contributions else None,
+                        rejected_target=rejected_output,
+                        audit_source="app_batch", model_version=model_entry.version,
+                        progress=lambda rows: progress_text.markdown(f"Scored {rows:,} rows..."))
+            except batch_scoring.BatchValidationError as e:
+                st.error(str(e))
+            else:
+                progress_text.success(str(report))
+                audit_log.record_batch_job(uploaded_file.name, report.rows, report.seconds,
+                                           model_entry.version, source="app_batch")
+                name, ext = uploaded_file.name.rsplit('.', 1)
+                st.download_button("Download Scored File", output.getvalue(),
+                                   file_name=f"{name}_scored.{ext}")
+                if report.rejected:
+                    st.warning(f"{report.rejected:,} rows had missing or out-of-range values and were "
+                               "not scored. Download them with the reason for each row below.")
+                    st.download_button("Download Rejected Rows", rejected_output.getvalue(),
+                                       file_name=f"{name}_rejected.{ext}")
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with tab4:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### Parameter Information")
         
@@ -535,10 +467,17 @@ def main():
         """)
         
         st.markdown('</div>', unsafe_allow_html=True)
+    
+    # The page has been sent; load the heavy modules before the user needs them
+    prewarm.start()
+
+if metrics.enabled and METRICS_PORT:
+    metrics.start_http_server(METRICS_PORT)
 
 if __name__ == "__main__":
     try:
-        main()
+        with metrics.timer("rerun"):
+            main()
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
         st.info("Please try refreshing the page. If the problem persists, contact support.")
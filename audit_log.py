@@ -0,0 +1,291 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import numpy as np
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: one writer process per log directory
+    fcntl = None
+from config import (AUDIT_LOG_DIR, AUDIT_LOG_ENABLED, AUDIT_LOG_MAX_BYTES,
+                    AUDIT_LOG_OVERFLOW)
+
+LOG_NAME = "predictions.jsonl"
+ROTATE_LOCK_NAME = ".rotate.lock"
+# Hex digits in a prediction's id (64 random bits)
+RECORD_ID_LENGTH = 16
+
+
+class AuditLog:
+    """Append-only JSONL log of predictions, written by a background thread.
+
+    Callers only pay for a ``queue.put``. The writer drains the queue in
+    batches, appends each batch with one write, fsyncs at most every
+    ``fsync_interval`` seconds, and rotates the file once it passes
+    ``max_bytes``. Several processes (serve.py workers) may append to the same
+    file: rotation is serialized with a lock file, and a writer whose file was
+    rotated by another process reopens the new one. When the queue is full a record is either dropped (and
+    counted) or the caller blocks for up to ``block_timeout`` seconds.
+    ``record_many`` (batch jobs) always waits for room, up to ``batch_timeout``
+    seconds per record, so a large file slows down rather than losing records.
+    """
+
+    def __init__(self, directory=AUDIT_LOG_DIR, max_bytes=AUDIT_LOG_MAX_BYTES,
+                 overflow=AUDIT_LOG_OVERFLOW, max_queue=10_000, batch_size=1_000,
+                 flush_interval=0.5, fsync_interval=5.0, block_timeout=0.05, batch_timeout=5.0):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"overflow must be 'drop' or 'block', not {overflow!r}")
+        self.directory = directory
+        self.path = os.path.join(directory, LOG_NAME)
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.block_timeout = block_timeout
+        self.batch_timeout = batch_timeout
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self._last_fsync = 0.0
+        self._dirty = False
+
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+            self._thread.start()
+        return self
+
+    def record(self, **fields):
+        """Queue one record; returns False if it was dropped."""
+        fields.setdefault("ts", time.time())
+        try:
+            if self.overflow == "block":
+                self._queue.put(fields, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(fields)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def record_many(self, records):
+        """Queue every record, waiting for room; returns how many were queued."""
+        records = iter(records)
+        queued = 0
+        for fields in records:
+            fields.setdefault("ts", time.time())
+            try:
+                self._queue.put(fields, timeout=self.batch_timeout)
+            except queue.Full:
+                # The writer has stalled; don't wait again for every remaining row
+                self.dropped += 1
+                self.dropped += sum(1 for _ in records)
+                break
+            queued += 1
+        return queued
+
+    def close(self, timeout=5.0):
+        """Flush everything queued so far and stop the writer."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        try:
+            while not (self._stop.is_set() and self._queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._write(batch)
+                else:
+                    # Idle: sync what earlier batches left unsynced, once it is due
+                    self._maybe_fsync()
+        finally:
+            if self._file is not None:
+                self._close()
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        if self._file is not None and self._rotated_elsewhere():
+            self._close()
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        data = "".join(json.dumps(record, separators=(",", ":"), default=_json_default) + "\n"
+                       for record in batch).encode()
+        self._file.write(data)
+        self._file.flush()
+        self.written += len(batch)
+        self._dirty = True
+        self._maybe_fsync()
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _maybe_fsync(self):
+        if self._dirty and time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._fsync()
+
+    def _fsync(self):
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+    def _rotated_elsewhere(self):
+        # True once self.path no longer names the file we have open
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self._file.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def _close(self):
+        if self._dirty:
+            self._fsync()
+        self._file.close()
+        self._file = None
+
+    def _rotate(self):
+        with open(os.path.join(self.directory, ROTATE_LOCK_NAME), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another process may have rotated the file since our last write;
+            # then there is nothing to rename, only the new file to open
+            rotated_elsewhere = self._rotated_elsewhere()
+            self._close()
+            if rotated_elsewhere:
+                return
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            rotated = os.path.join(self.directory, f"predictions-{stamp}.jsonl")
+            suffix = 1
+            while os.path.exists(rotated):
+                rotated = os.path.join(self.directory, f"predictions-{stamp}-{suffix}.jsonl")
+                suffix += 1
+            os.replace(self.path, rotated)
+
+
+def _json_default(value):
+    # NumPy scalars (predictions, probabilities)
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def _after_fork_in_child():
+    # A forked worker must not share the parent's writer thread or queue
+    global _log, _log_lock
+    _log = None
+    _log_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _collect():
+    if _log is None:
+        return []
+    return [("audit_records_written_total", {}, _log.written),
+            ("audit_records_dropped_total", {}, _log.dropped)]
+
+
+metrics.register_collector(_collect)
+
+
+def get_log():
+    """The process-wide audit log, started on first use; None when disabled."""
+    global _log
+    if not AUDIT_LOG_ENABLED:
+        return None
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                _log = AuditLog().start()
+                atexit.register(_log.close)
+    return _log
+
+
+def new_record_id():
+    return uuid.uuid4().hex[:RECORD_ID_LENGTH]
+
+
+def new_record_ids(count):
+    # One urandom call for a whole batch, ~10x cheaper per id than uuid4
+    digits = os.urandom(count * RECORD_ID_LENGTH // 2).hex()
+    return [digits[i:i + RECORD_ID_LENGTH] for i in range(0, len(digits), RECORD_ID_LENGTH)]
+
+
+def record_prediction(features, prediction, probability, model_version, latency_ms, source, **extra):
+    """Queue an audit record for one prediction. ``features`` maps name to value.
+
+    Returns the record's id, which outcomes uploaded later are matched on,
+    or None if the log is disabled or the record was dropped.
+    """
+    log = get_log()
+    if log is None:
+        return None
+    record_id = new_record_id()
+    if not log.record(id=record_id, source=source, model_version=model_version, features=features,
+                      prediction=prediction, probability=probability,
+                      latency_ms=round(latency_ms, 4), **extra):
+        return None
+    return record_id
+
+
+def record_predictions(feature_names, X, predictions, probabilities, model_version, latency_ms, source):
+    """Queue one audit record per row of a scored batch; returns how many were queued.
+
+    Every row shares ``latency_ms``, the time of the vectorized call it was
+    scored in. Unlike single predictions these are never dropped just because
+    the queue is momentarily full.
+    """
+    log = get_log()
+    if log is None or not len(X):
+        return 0
+    names = list(feature_names)
+    ts = time.time()
+    latency_ms = round(latency_ms, 4)
+    probabilities = [None] * len(X) if probabilities is None else np.asarray(probabilities).tolist()
+    records = (
+        {"id": record_id, "source": source, "model_version": model_version,
+         "features": dict(zip(names, row)), "prediction": prediction, "probability": probability,
+         "latency_ms": latency_ms, "ts": ts}
+        for record_id, row, prediction, probability in zip(
+            new_record_ids(len(X)), np.asarray(X).tolist(), np.asarray(predictions).tolist(), probabilities)
+    )
+    return log.record_many(records)
+
+
+def record_batch_job(name, rows, seconds, model_version, source):
+    """Queue one summary record for a scored file, next to the per-row records."""
+    log = get_log()
+    if log is None:
+        return False
+    return log.record(source=source, model_version=model_version, file=str(name),
+                      rows=rows, seconds=round(seconds, 4))
@@ -0,0 +1,271 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import audit_log
+import metrics
+import model_registry
+import validation
+
+DEFAULT_CHUNKSIZE = 50_000
+
+
+class BatchValidationError(ValueError):
+    pass
+
+
+class BatchReport:
+    __slots__ = ("rows", "chunks", "seconds", "rejected")
+
+    def __init__(self, rows=0, chunks=0, seconds=0.0, rejected=0):
+        self.rows = rows
+        self.chunks = chunks
+        self.seconds = seconds
+        self.rejected = rejected
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        text = (f"Scored {self.rows:,} rows in {self.chunks} chunks "
+                f"({self.seconds:.2f}s, {self.rows_per_sec:,.0f} rows/sec)")
+        if self.rejected:
+            text += f"; {self.rejected:,} invalid rows rejected"
+        return text
+
+
+def detect_format(name):
+    ext = os.path.splitext(str(name))[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".csv", ".txt", ""):
+        return "csv"
+    raise BatchValidationError(f"Unsupported file type '{ext}'. Use .csv or .parquet.")
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise BatchValidationError("Parquet support requires the 'pyarrow' package.") from None
+    return pyarrow
+
+
+def read_chunks(source, fmt, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrames of at most ``chunksize`` rows from a path or file object."""
+    if fmt == "parquet":
+        pa = _import_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize)
+
+
+def validate_columns(columns, feature_names):
+    missing = [name for name in feature_names if name not in columns]
+    if missing:
+        raise BatchValidationError(
+            f"Input is missing required column(s): {', '.join(missing)}. "
+            f"Expected: {', '.join(feature_names)}."
+        )
+
+
+class _CsvSink:
+    def __init__(self, target):
+        self._target = target
+        self._header = True
+
+    def write(self, frame):
+        # mode only matters when the target is a path
+        frame.to_csv(self._target, index=False, header=self._header, mode="w" if self._header else "a")
+        self._header = False
+
+    def close(self):
+        pass
+
+
+class _ParquetSink:
+    def __init__(self, target):
+        self._pa = _import_pyarrow()
+        self._target = target
+        self._writer = None
+
+    def write(self, frame):
+        table = self._pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pa.parquet.ParquetWriter(self._target, table.schema)
+        elif not table.schema.equals(self._writer.schema):
+            # Pass-through columns are typed per chunk (e.g. an int column
+            # with a blank cell becomes float); the file has one schema
+            try:
+                table = table.cast(self._writer.schema)
+            except (ValueError, self._pa.ArrowInvalid) as e:
+                raise BatchValidationError(
+                    f"Column types changed between chunks and can't be written to one Parquet file: {e}"
+                ) from None
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def feature_matrix(chunk, feature_names):
+    """The chunk's feature columns as a float array; unparseable cells become NaN."""
+    frame = chunk.loc[:, list(feature_names)]
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in frame.dtypes):
+        frame = frame.apply(pd.to_numeric, errors="coerce")
+    return frame.to_numpy(dtype=np.float64)
+
+
+def score_chunk(scorer, chunk, explainer=None):
+    """Score the valid rows of ``chunk``.
+
+    Returns ``(scored, rejected)``: the scored valid rows, and the invalid rows
+    with an ``errors`` column (None when every row passed validation).
+    """
+    X = feature_matrix(chunk, scorer.feature_names)
+    # Both outputs carry the feature columns as the floats that were validated,
+    # so their types don't depend on what a chunk's cells happened to contain
+    # (unparseable cells are NaN; the errors column says what was wrong)
+    chunk = chunk.assign(**dict(zip(scorer.feature_names, X.T)))
+    check = validation.validate(X, scorer.feature_names)
+    rejected = None
+    if not check.all_valid:
+        invalid = ~check.valid
+        rejected = chunk[invalid].copy()
+        rejected["errors"] = check.messages()[invalid]
+        chunk = chunk[check.valid]
+        X = X[check.valid]
+    if len(X):
+        predictions, probabilities = scorer.predict(X)
+    else:
+        # sklearn refuses empty input; score a dummy row so an all-invalid
+        # chunk still yields the same (empty) columns as the others
+        predictions, probabilities = scorer.predict(np.zeros((1, X.shape[1])))
+        predictions = predictions[:0]
+        probabilities = None if probabilities is None else probabilities[:0]
+    scored = chunk
+    scored["prediction"] = predictions
+    if probabilities is not None:
+        scored["probability"] = probabilities
+    # Contributions are changes in probability, so models without any get none
+    if explainer is not None and probabilities is not None:
+        contributions = explainer.explain(X) if len(X) else np.empty(X.shape)
+        for j, name in enumerate(scorer.feature_names):
+            scored[f"contribution_{name}"] = contributions[:, j]
+    return scored, rejected
+
+
+def _sink(target, fmt):
+    return _ParquetSink(target) if fmt == "parquet" else _CsvSink(target)
+
+
+def score_stream(scorer, source, target, in_fmt="csv", out_fmt="csv",
+                 chunksize=DEFAULT_CHUNKSIZE, progress=None, explainer=None, rejected_target=None,
+                 audit_source=None, model_version=None):
+    """Score ``source`` chunk by chunk and write each scored chunk to ``target``.
+
+    Only one chunk is held in memory at a time. ``progress`` is called with the
+    running row count after every chunk. With an ``explainer``, per-feature
+    contribution columns are added to every row. Rows that fail validation are
+    left out of ``target`` and written, with their errors, to ``rejected_target``
+    (if given); ``report.rejected`` counts them either way. With an
+    ``audit_source``, every scored row is also queued to the audit log.
+    """
+    sink = _sink(target, out_fmt)
+    rejected_sink = _sink(rejected_target, out_fmt) if rejected_target is not None else None
+    report = BatchReport()
+    start = time.perf_counter()
+    try:
+        for chunk in read_chunks(source, in_fmt, chunksize):
+            if report.chunks == 0:
+                validate_columns(chunk.columns, scorer.feature_names)
+            with metrics.timer("batch_chunk"):
+                chunk_start = time.perf_counter()
+                scored, rejected = score_chunk(scorer, chunk, explainer)
+                latency_ms = (time.perf_counter() - chunk_start) * 1e3
+                sink.write(scored)
+            if audit_source is not None:
+                audit_log.record_predictions(
+                    scorer.feature_names, scored.loc[:, list(scorer.feature_names)].to_numpy(),
+                    scored["prediction"].to_numpy(),
+                    scored["probability"].to_numpy() if "probability" in scored else None,
+                    model_version, latency_ms, source=audit_source)
+            if rejected is not None:
+                report.rejected += len(rejected)
+                metrics.inc("rejected_rows_total", len(rejected), source="batch")
+                if rejected_sink is not None:
+                    rejected_sink.write(rejected)
+            metrics.inc("predictions_total", len(scored), source="batch")
+            # Only rows actually scored and written; rejected ones are counted separately
+            report.rows += len(scored)
+            report.chunks += 1
+            if progress is not None:
+                progress(report.rows)
+    finally:
+        sink.close()
+        if rejected_sink is not None:
+            rejected_sink.close()
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def rejected_path(output_path):
+    """Where invalid rows go by default: ``scored.csv`` -> ``scored.rejected.csv``."""
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}.rejected{ext}"
+
+
+def score_file(input_path, output_path, scorer=None, chunksize=DEFAULT_CHUNKSIZE, explainer=None,
+               rejected_output=None, audit_source=None, model_version=None):
+    if scorer is None:
+        scorer = model_registry.get_scorer()
+    in_fmt = detect_format(input_path)
+    out_fmt = detect_format(output_path)
+    # The rejected file is only created if a row actually fails validation
+    if out_fmt == "csv":
+        with open(output_path, "w", newline="") as target:
+            return score_stream(scorer, input_path, target, in_fmt, out_fmt, chunksize,
+                                explainer=explainer, rejected_target=rejected_output,
+                                audit_source=audit_source, model_version=model_version)
+    return score_stream(scorer, input_path, output_path, in_fmt, out_fmt, chunksize,
+                        explainer=explainer, rejected_target=rejected_output,
+                        audit_source=audit_source, model_version=model_version)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file with the diabetes model.")
+    parser.add_argument("input", help="input .csv or .parquet file")
+    parser.add_argument("output", help="output .csv or .parquet file")
+    parser.add_argument("--model", help="model artifact to score with (default: the active model)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk")
+    parser.add_argument("--explain", action="store_true", help="add per-feature contribution columns")
+    parser.add_argument("--rejected", help="file for rows that fail validation (default: OUTPUT.rejected.EXT)")
+    args = parser.parse_args(argv)
+
+    try:
+        entry = model_registry.get_entry(args.model)
+        explainer = entry.explainer if args.explain else None
+        rejected_output = args.rejected or rejected_path(args.output)
+        report = score_file(args.input, args.output, entry.scorer, args.chunksize, explainer,
+                            rejected_output, audit_source="cli_batch", model_version=entry.version)
+    except (BatchValidationError, FileNotFoundError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(report, file=sys.stderr)
+    if report.rejected:
+        print(f"invalid rows written to {rejected_output}", file=sys.stderr)
+    audit_log.record_batch_job(args.input, report.rows, report.seconds, entry.version, source="cli_batch")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Import-time profile of the app's first run.
+
+Runs app.py once through Streamlit's AppTest in a fresh interpreter with
+``python -X importtime`` and reports which imports the app itself triggers
+(Streamlit's own startup is excluded).
+
+Usage:
+    python benchmarks/import_profile.py [--top 20] [--json profile.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+MARKER = "@@app-start@@"
+
+_SCRIPT = (
+    "import sys, warnings; warnings.filterwarnings('ignore')\n"
+    "from streamlit.testing.v1 import AppTest\n"
+    f"print({MARKER!r}, file=sys.stderr, flush=True)\n"
+    f"AppTest.from_file({APP_PATH!r}, default_timeout=60).run()\n"
+)
+
+
+def profile_app():
+    """Return ``[(module, self_us, cumulative_us, depth)]`` for imports made by app.py."""
+    # Prewarming would pull deferred modules into the profile from another thread
+    env = dict(os.environ, DIABETES_PREWARM="0")
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", _SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    records = []
+    started = False
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            started = True
+            continue
+        if not started or not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def summarize(records):
+    top_level = [r for r in records if r[3] == 0]
+    return {
+        "total_ms": sum(r[2] for r in top_level) / 1e3,
+        "modules": len(records),
+        "top_level": sorted(((r[0], r[2] / 1e3) for r in top_level), key=lambda r: -r[1]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    summary = summarize(profile_app())
+    print(f"app.py first run imported {summary['modules']} modules in {summary['total_ms']:.0f} ms")
+    for name, ms in summary["top_level"][:args.top]:
+        print(f"  {ms:>9.1f} ms  {name}")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
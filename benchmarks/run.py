@@ -0,0 +1,381 @@
+"""Reproducible local benchmarks for the diabetes app.
+
+Usage:
+    python benchmarks/run.py                      # run and compare to baseline.json
+    python benchmarks/run.py --update-baseline    # store the current numbers as baseline
+    python benchmarks/run.py --only predict chart # run a subset
+
+Results are written as JSON (``--output``). Every metric is "lower is better";
+a metric regresses when it exceeds ``baseline * (1 + tolerance)`` and the
+absolute difference is above the metric's noise floor. Metrics with a hard
+limit (``LIMITS``) fail whenever they exceed it, whatever the baseline says.
+"""
+import argparse
+import base64
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import numpy as np
+
+APP_PATH = os.path.join(ROOT, "app.py")
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_TOLERANCE = 1.0
+
+# Absolute differences below these are treated as noise, per unit
+NOISE_FLOOR = {"ms": 2.0, "us": 50.0, "s": 0.1, "MiB": 4.0, "B": 64}
+
+# Hard upper limits, filled in by the benchmarks that measure them
+LIMITS = {}
+
+warnings.filterwarnings("ignore")
+
+
+def timeit(func, repeat=7, number=1):
+    """Median wall time of ``number`` calls of ``func``, over ``repeat`` runs."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def rss_mib():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _app_test():
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(APP_PATH, default_timeout=60)
+
+
+def _click_predict(at):
+    button = next(b for b in at.button if b.label.startswith("Predict"))
+    button.click().run()
+
+
+def bench_startup(results):
+    # Fresh interpreter, so module imports and the model load are all cold
+    script = (
+        "import time, warnings; warnings.filterwarnings('ignore'); start = time.perf_counter()\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        "imported = time.perf_counter()\n"
+        f"AppTest.from_file({APP_PATH!r}, default_timeout=60).run()\n"
+        "print(imported - start, time.perf_counter() - imported)\n"
+    )
+    samples = []
+    for _ in range(3):
+        out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout
+        samples.append([float(v) for v in out.split()[-2:]])
+    results["startup.streamlit_import_s"] = (statistics.median(s[0] for s in samples), "s")
+    results["startup.first_run_s"] = (statistics.median(s[1] for s in samples), "s")
+
+
+def bench_imports(results):
+    from import_profile import profile_app, summarize
+    summary = summarize(profile_app())
+    results["startup.app_imports_ms"] = (summary["total_ms"], "ms")
+
+
+def bench_rerun(results):
+    at = _app_test()
+    at.run()
+    results["rerun.idle_ms"] = (timeit(at.run, repeat=7) * 1e3, "ms")
+    _click_predict(at)
+    results["rerun.with_result_ms"] = (timeit(at.run, repeat=7) * 1e3, "ms")
+    results["rerun.predict_click_ms"] = (timeit(lambda: _click_predict(at), repeat=5) * 1e3, "ms")
+
+
+def bench_predict(results):
+    import model_registry
+    # The sklearn numbers always come from the original pickle
+    model = model_registry.load_entry(os.path.join(ROOT, "diabetes_model.pkl")).model
+    scorer = model_registry.get_entry().scorer
+    rng = np.random.default_rng(0)
+    row = rng.uniform(0, 150, (1, 8))
+    batch = rng.uniform(0, 150, (100_000, 8))
+
+    results["predict.sklearn_row_us"] = (timeit(lambda: model.predict_proba(row), 7, 200) * 1e6, "us")
+    results["predict.sklearn_batch_100k_ms"] = (timeit(lambda: model.predict_proba(batch), 5) * 1e3, "ms")
+    results["predict.scorer_row_us"] = (timeit(lambda: scorer.predict(row), 7, 200) * 1e6, "us")
+    results["predict.scorer_batch_100k_ms"] = (timeit(lambda: scorer.predict(batch), 5) * 1e3, "ms")
+
+
+def bench_backends(results):
+    import model_format
+    import model_registry
+    from inference import BackendError, compile_model
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    linear = model_registry.load_entry(os.path.join(ROOT, "diabetes_model.pkl")).model
+    # A heavier model of the kind the pluggable backends are for, fit to the
+    # shipped model's own labels so it is deterministic
+    X = model_format.reference_inputs(5_000)
+    boosted = GradientBoostingClassifier(n_estimators=100, random_state=0).fit(X, linear.predict(X))
+    row = X[:1]
+    batch = model_format.reference_inputs(100_000, seed=1)
+    for model_name, model in (("linear", linear), ("boosted", boosted)):
+        for backend in ("numpy", "sklearn", "onnx"):
+            try:
+                scorer = compile_model(model, backend)
+            except BackendError:
+                continue
+            name = f"backend.{model_name}_{backend}"
+            results[f"{name}_row_us"] = (timeit(lambda: scorer.predict(row), 7, 200) * 1e6, "us")
+            results[f"{name}_batch_100k_ms"] = (timeit(lambda: scorer.predict(batch), 5) * 1e3, "ms")
+
+
+def bench_preview(results):
+    import model_registry
+    from config import LIVE_PREVIEW_MAX_ERROR
+    from features import FEATURE_BOUNDS
+    from preview import LookupPreview
+
+    scorer = model_registry.get_entry().scorer
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.uniform(*FEATURE_BOUNDS[name], 200_000) for name in scorer.feature_names])
+    # Integer inputs land exactly on or halfway between grid points
+    X[:100_000] = np.round(X[:100_000])
+    exact = scorer.predict(X)[1]
+    for max_error in sorted({0.001, LIVE_PREVIEW_MAX_ERROR, 0.02}):
+        preview = LookupPreview(scorer, max_error)
+        name = f"preview.max_error_{max_error:g}"
+        results[name] = (float(np.abs(preview.probability(X) - exact).max()), "p")
+        LIMITS[name] = max_error
+
+    preview = LookupPreview(scorer)
+    row = X[0].tolist()
+    results["preview.row_us"] = (timeit(lambda: preview.probability_row(row), 7, 2000) * 1e6, "us")
+    results["preview.exact_row_us"] = (timeit(lambda: scorer.predict(np.array(row)), 7, 2000) * 1e6, "us")
+    results["preview.table_bytes"] = (preview.nbytes, "B")
+
+
+def bench_analytics(results, rows=100_000):
+    import json
+    import tempfile
+
+    from features import FEATURE_NAMES
+    from prediction_store import CohortStats, PredictionStore
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "predictions.jsonl"), "w") as file:
+            for i in range(rows):
+                probability = float(rng.uniform())
+                file.write(json.dumps({
+                    "id": f"{i:016x}", "features": dict(zip(FEATURE_NAMES, rng.uniform(0, 100, 8).tolist())),
+                    "prediction": int(probability > 0.5), "probability": probability, "ts": 1.7e9 + i * 60,
+                }) + "\n")
+        store = PredictionStore(os.path.join(directory, "store"), directory)
+        start = time.perf_counter()
+        store.ingest()
+        results["analytics.ingest_100k_ms"] = ((time.perf_counter() - start) * 1e3, "ms")
+        stats = CohortStats()
+        start = time.perf_counter()
+        stats.update(store)
+        results["analytics.aggregate_100k_ms"] = ((time.perf_counter() - start) * 1e3, "ms")
+        # A page refresh with nothing new logged
+        results["analytics.refresh_noop_ms"] = (
+            timeit(lambda: (store.ingest(), stats.update(store)), 7, 10) * 1e3, "ms")
+
+
+def bench_chart(results):
+    import charts
+    names = ("Pregnancies", "Glucose", "Blood Pressure", "Skin Thickness",
+             "Insulin", "BMI", "Diabetes Pedigree", "Age")
+    values = (1.0, 120.0, 70.0, 20.0, 80.0, 30.0, 0.5, 33.0)
+    contributions = (0.1, 0.9, -0.2, 0.0, -0.1, 0.4, 0.05, 0.3)
+
+    # The cost get_image_download_link used to pay on every rerun: a 300 dpi
+    # render plus base64 encoding for an inline data: URI
+    def export_inline():
+        png = charts.render_contribution_png(names, values, contributions, "log-odds")
+        return base64.b64encode(png).decode()
+    results["chart.export_inline_base64_ms"] = (timeit(export_inline, 3) * 1e3, "ms")
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        charts.export_chart_png(names, values, contributions, "log-odds", directory=directory)
+        results["chart.export_cached_file_ms"] = (
+            timeit(lambda: charts.export_chart_png(names, values, contributions, "log-odds",
+                                                   directory=directory), 7, 20) * 1e3, "ms")
+
+
+def _record_media_sizes():
+    """Map of media file id -> size for every file AppTest stores from now on."""
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    sizes = {}
+    load_and_get_id = MemoryMediaFileStorage.load_and_get_id
+
+    def recording(self, *args, **kwargs):
+        file_id = load_and_get_id(self, *args, **kwargs)
+        sizes[file_id] = self.get_file(file_id).content_size
+        return file_id
+
+    MemoryMediaFileStorage.load_and_get_id = recording
+    return sizes
+
+
+def _page_bytes(at, media_sizes):
+    """Bytes the browser receives for one run: every element's delta message
+    plus the media files (images) those elements reference."""
+    total = 0
+    nodes = [at._tree]
+    while nodes:
+        node = nodes.pop()
+        children = getattr(node, "children", None)
+        if children:
+            nodes.extend(children.values())
+            continue
+        proto = getattr(node, "proto", None)
+        if proto is None or not hasattr(proto, "ByteSize"):
+            continue
+        total += proto.ByteSize()
+        if getattr(node, "type", None) == "image":
+            for image in proto.imgs:
+                file_id = image.url.rsplit("/", 1)[-1].split(".")[0]
+                total += media_sizes.get(file_id, 0)
+    return total
+
+
+def bench_payload(results):
+    media_sizes = _record_media_sizes()
+    at = _app_test()
+    at.run()
+    results["payload.idle_bytes"] = (_page_bytes(at, media_sizes), "B")
+    _click_predict(at)
+    results["payload.result_bytes"] = (_page_bytes(at, media_sizes), "B")
+
+
+def bench_sessions(results, sessions=20):
+    # Warm one session first so imports and the model load aren't counted
+    warm = _app_test()
+    warm.run()
+    _click_predict(warm)
+    gc.collect()
+    before = rss_mib()
+
+    apps = []
+    for i in range(sessions):
+        at = _app_test()
+        at.run()
+        at.number_input[0].set_value(30 + i)
+        _click_predict(at)
+        apps.append(at)
+    gc.collect()
+    growth = rss_mib() - before
+    results["memory.rss_growth_mib"] = (growth, "MiB")
+    results["memory.rss_per_session_mib"] = (growth / sessions, "MiB")
+
+    # AppTest reuses one session id, so size the per-session record directly
+    import session_store
+    store = session_store.SessionStore()
+    for i in range(1000):
+        store.put(f"session-{i}", (1, 120 + i, 70, 20, 80, 30.5, 0.5, 33), 0, 0.1 + i / 1e4, "v1")
+    results["memory.session_result_bytes"] = (store.footprint()["bytes_per_session"], "B")
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "imports": bench_imports,
+    "rerun": bench_rerun,
+    "predict": bench_predict,
+    "backends": bench_backends,
+    "preview": bench_preview,
+    "chart": bench_chart,
+    "analytics": bench_analytics,
+    "payload": bench_payload,
+    "sessions": bench_sessions,
+}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, metric in sorted(results.items()):
+        base = baseline.get("metrics", {}).get(name)
+        if base is None:
+            print(f"  {name:<36} {metric['value']:>12.3f} {metric['unit']:<4} (new)")
+            continue
+        value, base_value = metric["value"], base["value"]
+        change = (value - base_value) / base_value if base_value else 0.0
+        regressed = (value > base_value * (1 + tolerance)
+                     and value - base_value > NOISE_FLOOR.get(metric["unit"], 0.0))
+        flag = "REGRESSION" if regressed else ""
+        print(f"  {name:<36} {value:>12.3f} {metric['unit']:<4} baseline {base_value:>10.3f} "
+              f"({change:+.0%}) {flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results.json"))
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    raw = {}
+    for name in args.only or BENCHMARKS:
+        print(f"running {name}...", file=sys.stderr)
+        BENCHMARKS[name](raw)
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "metrics": {name: {"value": value, "unit": unit} for name, (value, unit) in raw.items()},
+    }
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    if args.update_baseline:
+        # Metrics that weren't run this time keep their stored values
+        metrics = dict(baseline.get("metrics", {}), **results["metrics"])
+        with open(args.baseline, "w") as file:
+            json.dump(dict(results, metrics=metrics), file, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results["metrics"], baseline, args.tolerance)
+    for name, limit in sorted(LIMITS.items()):
+        if raw[name][0] > limit:
+            print(f"  {name} = {raw[name][0]:.6f} exceeds its limit of {limit:g}")
+            regressions.append(name)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Throughput of the API versus the number of worker processes on this machine.
+
+Starts ``serve.py`` with 1, 2, 4, ... workers, drives it with keep-alive
+clients from separate processes for a fixed time, and reports requests/sec.
+Rows are random, so the per-process prediction cache doesn't flatter the numbers.
+
+Usage:
+    python benchmarks/scaling.py [--workers 1 2 4] [--seconds 5] [--clients 4] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+async def _connection(port, deadline, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    done = 0
+    try:
+        while time.monotonic() < deadline:
+            body = json.dumps([rng.randint(0, 10), rng.randint(50, 250), rng.randint(40, 120),
+                               rng.randint(0, 60), rng.randint(0, 400), round(rng.uniform(18, 50), 1),
+                               round(rng.uniform(0, 2), 3), rng.randint(20, 80)]).encode()
+            writer.write(b"POST /predict HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            headers = await reader.readuntil(b"\r\n\r\n")
+            length = int(headers.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            await reader.readexactly(length)
+            done += 1
+    finally:
+        writer.close()
+    return done
+
+
+def _client(port, seconds, connections, seed, results):
+    async def run():
+        deadline = time.monotonic() + seconds
+        counts = await asyncio.gather(*(_connection(port, deadline, seed * 1000 + i)
+                                        for i in range(connections)))
+        return sum(counts)
+    results.put(asyncio.run(run()))
+
+
+def measure(workers, seconds, clients, connections):
+    port = _free_port()
+    env = dict(os.environ, DIABETES_AUDIT_LOG="0")
+    server = subprocess.Popen([sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)],
+                              cwd=ROOT, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                              start_new_session=True)
+    try:
+        _wait_ready(port)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_client, args=(port, seconds, connections, i, results))
+                 for i in range(clients)]
+        start = time.monotonic()
+        for proc in procs:
+            proc.start()
+        total = sum(results.get() for _ in procs)
+        elapsed = time.monotonic() - start
+        for proc in procs:
+            proc.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(10)
+    return total / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, *(2 ** i for i in range(1, 6) if 2 ** i <= cpus), cpus})
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=max(2, cpus), help="load generator processes")
+    parser.add_argument("--connections", type=int, default=16, help="keep-alive connections per client")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    print(f"{cpus} CPU(s); {args.clients} client processes x {args.connections} connections")
+    rows = []
+    for workers in args.workers:
+        throughput = measure(workers, args.seconds, args.clients, args.connections)
+        rows.append({"workers": workers, "requests_per_sec": throughput})
+        speedup = throughput / rows[0]["requests_per_sec"]
+        print(f"  {workers:>3} worker(s): {throughput:>10,.0f} req/s  ({speedup:.2f}x)")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"cpus": cpus, "results": rows}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
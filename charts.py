@@ -0,0 +1,225 @@
+import hashlib
+import io
+import os
+import tempfile
+
+import pandas as pd
+
+import metrics
+from config import CHART_EXPORT_CACHE_FILES, CHART_EXPORT_DIR
+
+EXPORT_DPI = 300
+
+# Inputs that raise the risk are purple, inputs that lower it are green
+RAISES_COLOR = '#8B5CF6'
+LOWERS_COLOR = '#10B981'
+
+
+def contribution_frame(feature_names, feature_values, contributions):
+    """Rows of the contribution chart, largest contribution first."""
+    with metrics.timer("dataframe_build"):
+        df = pd.DataFrame({
+            'Feature': feature_names,
+            'Value': feature_values,
+            'Contribution': contributions
+        })
+        df['Color'] = [RAISES_COLOR if c > 0 else LOWERS_COLOR for c in contributions]
+        return df.sort_values('Contribution', ascending=False)
+
+
+# Vega-Lite specs for the charts drawn in the browser. Written out as plain
+# dicts because building them through Altair (which st.bar_chart and
+# st.line_chart do internally) costs tens of milliseconds per rerun.
+
+def contribution_spec(units):
+    return {
+        "transform": [{"calculate": "max(datum.Contribution, 0)", "as": "label_x"}],
+        "encoding": {"y": {"field": "Feature", "type": "nominal", "sort": None, "title": None}},
+        "layer": [
+            {
+                "mark": "bar",
+                "encoding": {
+                    "x": {"field": "Contribution", "type": "quantitative",
+                          "title": f"Contribution to Risk ({units}, relative to an average patient)"},
+                    "color": {"field": "Color", "type": "nominal", "scale": None},
+                    "tooltip": [{"field": "Feature"},
+                                {"field": "Value", "type": "quantitative", "format": ".1f"},
+                                {"field": "Contribution", "type": "quantitative", "format": ".3f"}],
+                },
+            },
+            {"mark": {"type": "rule", "color": "#6B7280"}, "encoding": {"x": {"datum": 0}}},
+            {
+                "mark": {"type": "text", "align": "left", "dx": 4},
+                "encoding": {"x": {"field": "label_x", "type": "quantitative"},
+                             "text": {"field": "Value", "type": "quantitative", "format": ".1f"}},
+            },
+        ],
+    }
+
+
+def risk_curve_spec(feature_label):
+    return {
+        "mark": {"type": "line", "color": RAISES_COLOR},
+        "encoding": {
+            "x": {"field": "value", "type": "quantitative", "title": feature_label},
+            "y": {"field": "risk", "type": "quantitative", "title": "Risk (%)"},
+            "tooltip": [{"field": "value", "type": "quantitative", "title": feature_label},
+                        {"field": "risk", "type": "quantitative", "title": "Risk (%)", "format": ".1f"}],
+        },
+    }
+
+
+def risk_heatmap_spec(x_label, y_label):
+    return {
+        "mark": "rect",
+        "encoding": {
+            "x": {"field": "x", "type": "ordinal", "title": x_label, "axis": {"labelOverlap": True}},
+            "y": {"field": "y", "type": "ordinal", "title": y_label, "sort": "descending",
+                  "axis": {"labelOverlap": True}},
+            "color": {"field": "risk", "type": "quantitative", "title": "Risk (%)",
+                      "scale": {"scheme": "purples"}},
+            "tooltip": [{"field": "x", "type": "quantitative", "title": x_label},
+                        {"field": "y", "type": "quantitative", "title": y_label},
+                        {"field": "risk", "type": "quantitative", "title": "Risk (%)", "format": ".1f"}],
+        },
+    }
+
+
+def risk_histogram_spec():
+    return {
+        "mark": {"type": "bar", "color": RAISES_COLOR},
+        "encoding": {
+            "x": {"field": "risk", "type": "quantitative", "bin": {"binned": True, "step": 5},
+                  "title": "Predicted risk (%)"},
+            "x2": {"field": "risk_end"},
+            "y": {"field": "count", "type": "quantitative", "title": "Predictions"},
+            "tooltip": [{"field": "risk", "title": "From (%)"}, {"field": "count", "title": "Predictions"}],
+        },
+    }
+
+
+def feature_trend_spec(feature_label, training_mean):
+    return {
+        "layer": [
+            {
+                "mark": {"type": "line", "point": True, "color": RAISES_COLOR},
+                "encoding": {
+                    "x": {"field": "day", "type": "temporal", "title": None},
+                    "y": {"field": "mean", "type": "quantitative", "title": f"Daily mean {feature_label}",
+                          "scale": {"zero": False}},
+                    "tooltip": [{"field": "day", "type": "temporal"},
+                                {"field": "mean", "type": "quantitative", "format": ".2f"},
+                                {"field": "count", "type": "quantitative", "title": "Predictions"}],
+                },
+            },
+            # Mean of the data the model was trained on
+            {"mark": {"type": "rule", "color": LOWERS_COLOR, "strokeDash": [4, 4]},
+             "encoding": {"y": {"datum": training_mean}}},
+        ],
+    }
+
+
+def calibration_spec():
+    return {
+        "layer": [
+            {"mark": {"type": "rule", "color": "#6B7280", "strokeDash": [4, 4]},
+             "encoding": {"x": {"datum": 0}, "y": {"datum": 0}, "x2": {"datum": 100}, "y2": {"datum": 100}}},
+            {
+                "mark": {"type": "line", "point": True, "color": RAISES_COLOR},
+                "encoding": {
+                    "x": {"field": "predicted", "type": "quantitative", "title": "Mean predicted risk (%)",
+                          "scale": {"domain": [0, 100]}},
+                    "y": {"field": "observed", "type": "quantitative", "title": "Observed rate (%)",
+                          "scale": {"domain": [0, 100]}},
+                    "tooltip": [{"field": "predicted", "type": "quantitative", "format": ".1f"},
+                                {"field": "observed", "type": "quantitative", "format": ".1f"},
+                                {"field": "count", "type": "quantitative", "title": "Predictions"}],
+                },
+            },
+        ],
+    }
+
+
+def _contribution_figure(feature_names, feature_values, contributions, units):
+    # Only needed for PNG export, so matplotlib stays out of the page render path
+    from matplotlib.figure import Figure
+
+    df = contribution_frame(feature_names, feature_values, contributions)
+
+    # Figures are created without pyplot so they are never registered in its
+    # global figure manager and can't pile up across sessions.
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.barh(df['Feature'], df['Contribution'], color=df['Color'])
+    ax.axvline(0, color='#6B7280', linewidth=0.8)
+
+    # Add value labels to the bars
+    offset = 0.01 * max(df['Contribution'].abs().max(), 1e-9)
+    for i, (value, contribution) in enumerate(zip(df['Value'], df['Contribution'])):
+        ax.text(max(contribution, 0) + offset, i, f'{value:.1f}', va='center')
+
+    ax.set_xlabel(f'Contribution to Risk ({units}, relative to an average patient)')
+    ax.set_title('Feature Contributions to Diabetes Risk')
+    fig.tight_layout()
+    return fig
+
+
+def figure_png(fig, dpi):
+    buf = io.BytesIO()
+    try:
+        with metrics.timer("png_encode"):
+            fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+
+def render_contribution_png(feature_names, feature_values, contributions, units, dpi=EXPORT_DPI):
+    """PNG bytes of the feature contribution chart, drawn with matplotlib."""
+    with metrics.timer("chart_render"):
+        fig = _contribution_figure(feature_names, feature_values, contributions, units)
+    return figure_png(fig, dpi)
+
+
+def _prune_exports(directory, keep):
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.png')]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[keep:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def export_chart_path(feature_names, feature_values, contributions, units,
+                      dpi=EXPORT_DPI, directory=CHART_EXPORT_DIR):
+    """Path of the high resolution chart PNG, rendered only if it isn't on disk yet.
+
+    Files are named by a hash of the chart's inputs, so every session (and
+    every restart) asking for the same chart gets the same file.
+    """
+    key = repr((tuple(feature_names), tuple(feature_values), tuple(contributions), units, dpi))
+    path = os.path.join(directory, hashlib.sha256(key.encode()).hexdigest()[:32] + '.png')
+    try:
+        # Touch it, so pruning removes the least recently used files first
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+    png = render_contribution_png(feature_names, feature_values, contributions, units, dpi)
+    # Only this process's user may read the files (mkstemp creates them 0600)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    with os.fdopen(fd, 'wb') as file:
+        file.write(png)
+    os.replace(tmp, path)
+    _prune_exports(directory, CHART_EXPORT_CACHE_FILES)
+    return path
+
+
+def export_chart_png(*args, **kwargs):
+    with open(export_chart_path(*args, **kwargs), 'rb') as file:
+        return file.read()
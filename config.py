@@ -0,0 +1,66 @@
+import os
+
+# Application settings. Every value can be overridden with an environment
+# variable so the same code runs locally, in Spaces and behind the API server.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The pickle-free .lrmodel export is preferred; the pickle remains as a fallback
+MODEL_PATH = os.environ.get("DIABETES_MODEL_PATH") or next(
+    (path for path in (os.path.join(BASE_DIR, "diabetes_model.lrmodel"),
+                       os.path.join(BASE_DIR, "diabetes_model.pkl"))
+     if os.path.exists(path)),
+    os.path.join(BASE_DIR, "diabetes_model.pkl"))
+
+# Versioned model artifacts. When the directory has a CURRENT pointer it takes
+# precedence over MODEL_PATH; it is polled every MODEL_POLL_INTERVAL seconds.
+MODEL_REGISTRY_DIR = os.environ.get("DIABETES_MODEL_REGISTRY_DIR", os.path.join(BASE_DIR, "models"))
+MODEL_POLL_INTERVAL = float(os.environ.get("DIABETES_MODEL_POLL_INTERVAL", "5"))
+# Prediction backend: "auto", "numpy", "sklearn" or "onnx" (see inference.py)
+MODEL_BACKEND = os.environ.get("DIABETES_MODEL_BACKEND", "auto")
+# Memory-map .lrmodel arrays: "auto" (large files only), "1" (always) or "0" (never).
+# Mapped weights live in the page cache once, however many worker processes use them.
+MODEL_MMAP = {"1": True, "0": False}.get(os.environ.get("DIABETES_MODEL_MMAP", "auto"))
+
+# Directory for precomputed tables shared by worker processes as mmap'd .npy
+# files (e.g. /dev/shm/diabetes). Unset means every process keeps its own copy.
+SHARED_TABLES_DIR = os.environ.get("DIABETES_SHARED_TABLES_DIR") or None
+# At most this many tables are kept there, least recently used removed first;
+# /dev/shm is RAM, and API clients choose which sweeps get computed.
+SHARED_TABLES_MAX_FILES = int(os.environ.get("DIABETES_SHARED_TABLES_MAX_FILES", "512"))
+
+# Import pandas/matplotlib in a background thread after the first page render
+PREWARM = os.environ.get("DIABETES_PREWARM", "1") != "0"
+
+# Live risk estimate shown while the form is being edited, from precomputed lookup
+# tables. The estimate is within LIVE_PREVIEW_MAX_ERROR (probability) of the exact
+# model; "Predict" always runs the exact model.
+LIVE_PREVIEW = os.environ.get("DIABETES_LIVE_PREVIEW", "1") != "0"
+LIVE_PREVIEW_MAX_ERROR = float(os.environ.get("DIABETES_LIVE_PREVIEW_MAX_ERROR", "0.005"))
+
+# High resolution chart exports are rendered once and kept here as files;
+# at most CHART_EXPORT_CACHE_FILES of them, least recently used removed first.
+# They show a patient's inputs, so keep this out of the static/ directory.
+CHART_EXPORT_DIR = os.environ.get("DIABETES_CHART_EXPORT_DIR", os.path.join(BASE_DIR, "logs", "chart_exports"))
+CHART_EXPORT_CACHE_FILES = int(os.environ.get("DIABETES_CHART_EXPORT_CACHE_FILES", "256"))
+
+# Process-wide cache of single-row predictions
+PREDICTION_CACHE_SIZE = int(os.environ.get("DIABETES_PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL = float(os.environ.get("DIABETES_PREDICTION_CACHE_TTL", "3600"))
+
+# Assessment results of sessions idle for longer than this are dropped
+SESSION_IDLE_TIMEOUT = float(os.environ.get("DIABETES_SESSION_IDLE_TIMEOUT", "1800"))
+
+# Append-only audit log of every prediction, written by a background thread
+AUDIT_LOG_ENABLED = os.environ.get("DIABETES_AUDIT_LOG", "1") != "0"
+AUDIT_LOG_DIR = os.environ.get("DIABETES_AUDIT_LOG_DIR", os.path.join(BASE_DIR, "logs"))
+AUDIT_LOG_MAX_BYTES = int(os.environ.get("DIABETES_AUDIT_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+# What to do when the writer falls behind: "drop" new records or "block" the caller briefly
+AUDIT_LOG_OVERFLOW = os.environ.get("DIABETES_AUDIT_LOG_OVERFLOW", "drop")
+
+# Columnar copy of the audit log's predictions that the Analytics page reads
+PREDICTION_STORE_DIR = os.environ.get("DIABETES_PREDICTION_STORE_DIR", os.path.join(AUDIT_LOG_DIR, "store"))
+
+# Prometheus-style metrics. Off by default; timers are no-ops when disabled.
+METRICS_ENABLED = os.environ.get("DIABETES_METRICS", "0") == "1"
+# Port of the /metrics endpoint started inside the Streamlit process (0 = none)
+METRICS_PORT = int(os.environ.get("DIABETES_METRICS_PORT", "9464"))
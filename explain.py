@@ -0,0 +1,71 @@
+from functools import lru_cache
+
+import numpy as np
+
+from features import BACKGROUND_MEAN
+from inference import LinearScorer
+
+EXPLANATION_CACHE_SIZE = 1024
+
+
+class LinearExplainer:
+    """Exact per-feature contributions for a linear model: coef * (x - mean).
+
+    Contributions are in log-odds and sum to the difference between the
+    row's decision score and the score of the background mean.
+    """
+
+    units = "log-odds"
+
+    def __init__(self, coef, background_mean):
+        self.coef = np.asarray(coef, dtype=np.float64).reshape(-1)
+        self.background_mean = np.asarray(background_mean, dtype=np.float64)
+        self.explain_row = lru_cache(maxsize=EXPLANATION_CACHE_SIZE)(self._explain_row)
+
+    def explain(self, X):
+        """Contributions for every row of ``X``, shape (n_rows, n_features)."""
+        X = np.asarray(X, dtype=np.float64)
+        return (X - self.background_mean) * self.coef
+
+    def _explain_row(self, row):
+        return tuple(self.explain(np.array([row]))[0].tolist())
+
+
+class OcclusionExplainer:
+    """Model-agnostic contributions for models without a linear form.
+
+    Each feature's contribution is the drop in predicted probability when that
+    feature is replaced by its background mean. All perturbed copies of a batch
+    are scored in a single predict call. Models without probabilities (no
+    ``predict_proba``) get no contributions: ``explain`` returns None.
+    """
+
+    units = "probability"
+
+    def __init__(self, scorer, background_mean):
+        self.scorer = scorer
+        self.background_mean = np.asarray(background_mean, dtype=np.float64)
+        self.explain_row = lru_cache(maxsize=EXPLANATION_CACHE_SIZE)(self._explain_row)
+
+    def explain(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        n_rows, n_features = X.shape
+        # Block 0 is the unmodified rows, block j+1 has feature j occluded
+        perturbed = np.repeat(X[np.newaxis], n_features + 1, axis=0)
+        index = np.arange(n_features)
+        perturbed[index + 1, :, index] = self.background_mean[:, np.newaxis]
+        _, probabilities = self.scorer.predict(perturbed.reshape(-1, n_features))
+        if probabilities is None:
+            return None
+        probabilities = probabilities.reshape(n_features + 1, n_rows)
+        return (probabilities[0] - probabilities[1:]).T
+
+    def _explain_row(self, row):
+        contributions = self.explain(np.array([row]))
+        return None if contributions is None else tuple(contributions[0].tolist())
+
+
+def make_explainer(scorer, background_mean=BACKGROUND_MEAN):
+    if isinstance(scorer, LinearScorer):
+        return LinearExplainer(scorer.coef_T, background_mean)
+    return OcclusionExplainer(scorer, background_mean)
@@ -0,0 +1,42 @@
+# Model input features, in the order the model was trained on and the order
+# main() builds its input row in.
+FEATURE_NAMES = (
+    "Pregnancies",
+    "Glucose",
+    "BloodPressure",
+    "SkinThickness",
+    "Insulin",
+    "BMI",
+    "DiabetesPedigreeFunction",
+    "Age",
+)
+
+
+def model_feature_names(model):
+    """Feature names the model was fitted with, falling back to FEATURE_NAMES."""
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        return FEATURE_NAMES
+    return tuple(str(name) for name in names)
+
+
+# Column means of the Pima Indians Diabetes dataset the model was trained on.
+# Explanations measure each input's contribution relative to this average patient.
+BACKGROUND_MEAN = (3.845, 120.895, 69.105, 20.536, 79.799, 31.993, 0.472, 33.241)
+
+# Accepted input range per feature: the form widgets' limits, the validation
+# bounds, and the range swept by sensitivity charts and preview tables
+FEATURE_BOUNDS = {
+    "Pregnancies": (0, 20),
+    "Glucose": (0, 300),
+    "BloodPressure": (0, 200),
+    "SkinThickness": (0, 100),
+    "Insulin": (0, 850),
+    "BMI": (0.0, 70.0),
+    "DiabetesPedigreeFunction": (0.0, 2.5),
+    "Age": (0, 120),
+}
+
+# Features a real patient can't have a zero for. The training data used 0 to
+# mean "not measured", so these must be strictly positive.
+REQUIRED_FEATURES = ("Glucose", "BloodPressure", "BMI", "Age")
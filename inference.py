@@ -0,0 +1,280 @@
+"""Prediction backends.
+
+Every backend wraps a loaded model in a scorer with the same interface:
+``predict(X)`` returns ``(predictions, probabilities)`` and ``kind`` names the
+backend. Which one serves is set by DIABETES_MODEL_BACKEND:
+
+    auto     numpy for binary logistic regression, sklearn for anything else
+    numpy    one dot product and a sigmoid (binary logistic regression only)
+    sklearn  the model's own predict/predict_proba
+    onnx     the model converted to ONNX and run by onnxruntime on the CPU
+             (optional: pip install onnxruntime skl2onnx)
+
+Check that the backends agree on a model before switching:
+
+    python inference.py parity [--model diabetes_model.pkl]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+# sklearn's own sigmoid: a NumPy 1/(1+exp(-x)) differs from it by one ulp for
+# ~2% of inputs, which would break exact parity with predict_proba
+from scipy.special import expit
+
+import metrics
+from config import MODEL_BACKEND
+from features import model_feature_names
+
+BACKENDS = ("auto", "numpy", "sklearn", "onnx")
+
+# Largest probability difference from scikit-learn's predict_proba each
+# backend may show in the parity check. ONNX tree ensembles only run in
+# float32, so that backend is allowed rounding error.
+PARITY_TOLERANCE = {"numpy": 0.0, "sklearn": 0.0, "onnx": 1e-5}
+
+
+class BackendError(ValueError):
+    pass
+
+
+class SklearnScorer:
+    """Fallback scorer that defers to the model's own predict/predict_proba."""
+
+    kind = "sklearn"
+
+    def __init__(self, model):
+        self.model = model
+        self.classes = getattr(model, "classes_", None)
+        self.feature_names = model_feature_names(model)
+
+    def predict(self, X):
+        """Return ``(predictions, probabilities)``; probabilities are for the positive class."""
+        with metrics.timer("predict_sklearn"):
+            predictions = self.model.predict(X)
+            if not hasattr(self.model, "predict_proba"):
+                return predictions, None
+            return predictions, self.model.predict_proba(X)[:, 1]
+
+
+class LinearScorer:
+    """Binary logistic regression compiled down to one dot product and a sigmoid.
+
+    Mirrors sklearn's ``decision_function``/``_predict_proba_lr`` arithmetic, so
+    the results are identical to ``predict`` and ``predict_proba`` without the
+    per-call input validation.
+    """
+
+    kind = "numpy"
+
+    def __init__(self, coef, intercept, classes, feature_names):
+        self.coef_T = np.ascontiguousarray(coef, dtype=np.float64).T
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.feature_names = tuple(feature_names)
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return (X @ self.coef_T + self.intercept).reshape(-1)
+
+    def predict(self, X):
+        with metrics.timer("predict_numpy"):
+            scores = self.decision_function(X)
+            predictions = self.classes.take((scores > 0).astype(np.intp))
+            return predictions, expit(scores)
+
+
+class OnnxScorer:
+    """The model converted to ONNX with skl2onnx and run by onnxruntime.
+
+    Inputs are fed as float64 when the converter supports it for the model,
+    otherwise as float32 (tree ensembles), which costs some rounding.
+    """
+
+    kind = "onnx"
+
+    def __init__(self, model):
+        try:
+            import onnxruntime
+            from skl2onnx import to_onnx
+            from skl2onnx.common.data_types import DoubleTensorType, FloatTensorType
+        except ImportError:
+            raise BackendError("The onnx backend needs the 'onnxruntime' and 'skl2onnx' packages.") from None
+
+        self.model = model
+        self.classes = getattr(model, "classes_", None)
+        self.feature_names = model_feature_names(model)
+        source = _as_sklearn(model)
+        n_features = len(self.feature_names)
+
+        errors = []
+        for tensor_type, dtype in ((DoubleTensorType, np.float64), (FloatTensorType, np.float32)):
+            try:
+                onx = to_onnx(source, initial_types=[("X", tensor_type([None, n_features]))],
+                              options={id(source): {"zipmap": False}})
+                options = onnxruntime.SessionOptions()
+                # Requests are small and several workers may share the CPU;
+                # one thread per session avoids oversubscribing it
+                options.intra_op_num_threads = 1
+                session = onnxruntime.InferenceSession(onx.SerializeToString(), options,
+                                                       providers=["CPUExecutionProvider"])
+            except Exception as e:
+                # Converter errors can embed the whole serialized model
+                errors.append(f"{dtype.__name__}: {str(e).splitlines()[0][:200]}")
+                continue
+            self.session = session
+            self.dtype = dtype
+            self.input_name = session.get_inputs()[0].name
+            return
+        raise BackendError(f"Can't convert {type(model).__name__} to ONNX ({'; '.join(errors)})")
+
+    def predict(self, X):
+        with metrics.timer("predict_onnx"):
+            X = np.asarray(X, dtype=self.dtype)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+            predictions, probabilities = self.session.run(None, {self.input_name: X})
+            if probabilities.shape[1] != 2:
+                return predictions, None
+            return predictions, probabilities[:, 1].astype(np.float64)
+
+
+def _as_sklearn(model):
+    # skl2onnx only knows sklearn estimators, and parity must compare against
+    # sklearn itself; a .lrmodel is rebuilt as one
+    from model_format import LinearModel
+    if not isinstance(model, LinearModel):
+        return model
+    from sklearn.linear_model import LogisticRegression
+    estimator = LogisticRegression()
+    estimator.coef_ = model.coef_
+    estimator.intercept_ = model.intercept_
+    estimator.classes_ = model.classes_
+    estimator.n_features_in_ = model.n_features_in_
+    return estimator
+
+
+def _is_binary_logistic(model):
+    # Models restored from a .lrmodel file are binary logistic regressions by
+    # construction; checking them first keeps sklearn out of the import path
+    from model_format import LinearModel
+    if isinstance(model, LinearModel):
+        return True
+    try:
+        from sklearn.linear_model import LogisticRegression
+    except ImportError:
+        return False
+    if not isinstance(model, LogisticRegression):
+        return False
+    # Multinomial binary models use a softmax over (-d, d) in older sklearn
+    if getattr(model, "multi_class", "auto") == "multinomial":
+        return False
+    coef = getattr(model, "coef_", None)
+    return (
+        isinstance(coef, np.ndarray)
+        and coef.ndim == 2
+        and coef.shape[0] == 1
+        and len(model.classes_) == 2
+    )
+
+
+def compile_model(model, backend=None):
+    """Wrap ``model`` in the scorer for ``backend`` (default: DIABETES_MODEL_BACKEND).
+
+    "auto" picks the fastest scorer that reproduces the model exactly.
+    Raises BackendError if the backend can't serve the model.
+    """
+    backend = backend or MODEL_BACKEND
+    if backend not in BACKENDS:
+        raise BackendError(f"Unknown model backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    if backend in ("auto", "numpy"):
+        if _is_binary_logistic(model):
+            return LinearScorer(model.coef_, model.intercept_, model.classes_,
+                                model_feature_names(model))
+        if backend == "numpy":
+            raise BackendError(f"The numpy backend only serves binary logistic regression, "
+                               f"not {type(model).__name__}")
+    if backend == "onnx":
+        return OnnxScorer(model)
+    return SklearnScorer(model)
+
+
+def _latency(scorer, X, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scorer.predict(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parity(model, X, backends=("numpy", "sklearn", "onnx")):
+    """Score ``X`` with every backend and compare against scikit-learn's output.
+
+    The reference is the sklearn estimator itself, also for a .lrmodel (whose
+    own predict_proba is NumPy code). Returns one dict per backend with the largest probability difference,
+    the number of rows whose predicted class differs, per-row and batch
+    latency, and whether it is within PARITY_TOLERANCE. Backends that can't
+    serve the model are reported with their error instead.
+    """
+    estimator = _as_sklearn(model)
+    reference_predictions = estimator.predict(X)
+    reference = estimator.predict_proba(X)[:, 1] if hasattr(estimator, "predict_proba") else None
+    report = []
+    for backend in backends:
+        try:
+            scorer = compile_model(model, backend)
+        except BackendError as e:
+            report.append({"backend": backend, "error": str(e)})
+            continue
+        predictions, probabilities = scorer.predict(X)
+        tolerance = PARITY_TOLERANCE[backend]
+        if reference is None or probabilities is None:
+            difference = 0.0 if reference is None and probabilities is None else float("inf")
+            near_threshold = np.zeros(len(X), dtype=bool)
+        else:
+            difference = float(np.abs(probabilities - reference).max())
+            # Rounding may only flip the class of rows this close to the threshold
+            near_threshold = np.abs(reference - 0.5) <= tolerance
+        mismatched = np.asarray(predictions) != reference_predictions
+        report.append({
+            "backend": backend,
+            "max_difference": difference,
+            "mismatched": int(mismatched.sum()),
+            "row_us": _latency(scorer, X[:1]) * 1e6,
+            "batch_ms": _latency(scorer, X) * 1e3,
+            "ok": difference <= tolerance and not (mismatched & ~near_threshold).any(),
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    parity_cmd = commands.add_parser("parity", help="check that every backend agrees with the model")
+    parity_cmd.add_argument("--model", help="model artifact (default: the active model)")
+    parity_cmd.add_argument("--rows", type=int, default=10_000, help="reference rows to score")
+    args = parser.parse_args(argv)
+
+    import model_format
+    import model_registry
+
+    model = model_registry.get_entry(args.model).model
+    X = model_format.reference_inputs(args.rows)
+    failed = False
+    print(f"{'backend':<8} {'max |dp|':>10} {'classes':>8} {'row':>10} {f'{len(X):,} rows':>12}")
+    for result in parity(model, X):
+        if "error" in result:
+            print(f"{result['backend']:<8} unavailable: {result['error']}")
+            continue
+        failed |= not result["ok"]
+        print(f"{result['backend']:<8} {result['max_difference']:>10.2g} {result['mismatched']:>8} "
+              f"{result['row_us']:>8.1f}us {result['batch_ms']:>10.2f}ms {'' if result['ok'] else 'MISMATCH'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
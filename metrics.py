@@ -0,0 +1,205 @@
+"""Minimal Prometheus-style instrumentation.
+
+    with metrics.timer("prediction"):
+        ...
+    metrics.inc("predictions_total", source="app")
+
+When DIABETES_METRICS isn't "1", ``timer`` returns a shared no-op context
+manager and ``inc`` returns immediately, so instrumented code pays one
+function call. ``render()`` produces the Prometheus text exposition format.
+"""
+import bisect
+import contextlib
+import logging
+import threading
+import time
+
+from config import METRICS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "diabetes_"
+
+# Phase durations in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+enabled = METRICS_ENABLED
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_collectors = []
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+def _histogram(phase):
+    histogram = _histograms.get(phase)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(phase, Histogram())
+    return histogram
+
+
+def timer(phase):
+    """Context manager recording the duration of ``phase``."""
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(_histogram(phase))
+
+
+def observe(phase, seconds):
+    if enabled:
+        _histogram(phase).observe(seconds)
+
+
+def inc(name, amount=1, **labels):
+    if not enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def register_collector(collect):
+    """Register ``collect() -> [(name, labels_dict, value)]``, evaluated at render time.
+
+    Used for values other modules already track (cache hit counters etc.), so
+    they cost nothing until scraped.
+    """
+    _collectors.append(collect)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def snapshot():
+    """Phase timings and counters as plain dicts, for the developer panel."""
+    with _lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+    phases = {phase: {"count": h.count, "total_s": h.sum, "mean_ms": h.sum / h.count * 1e3 if h.count else 0.0}
+              for phase, h in sorted(histograms.items())}
+    values = {f"{name}{_format_labels(labels)}": value for (name, labels), value in sorted(counters.items())}
+    for collect in _collectors:
+        for name, labels, value in collect():
+            values[f"{name}{_format_labels(sorted(labels.items()))}"] = value
+    return {"phases": phases, "counters": values}
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+
+    name = f"{PREFIX}phase_duration_seconds"
+    lines.append(f"# TYPE {name} histogram")
+    for phase, histogram in histograms:
+        with histogram.lock:
+            counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS + (float("inf"),), counts):
+            cumulative += bucket
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{phase="{phase}",le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{phase="{phase}"}} {total}')
+        lines.append(f'{name}_count{{phase="{phase}"}} {count}')
+
+    seen = set()
+    for (counter, labels), value in counters:
+        if counter not in seen:
+            seen.add(counter)
+            lines.append(f"# TYPE {PREFIX}{counter} counter")
+        lines.append(f"{PREFIX}{counter}{_format_labels(labels)} {value}")
+
+    for collect in _collectors:
+        for counter, labels, value in collect():
+            lines.append(f"{PREFIX}{counter}{_format_labels(sorted(labels.items()))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+_server = None
+# Set by the first call, whether or not the port could be bound, so Streamlit
+# reruns don't retry a bind that already failed
+_server_attempted = False
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve ``render()`` at http://host:port/metrics from a daemon thread.
+
+    Only the first call per process tries to bind; later calls return the
+    running server, or None if that first attempt failed.
+    """
+    global _server, _server_attempted
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _lock:
+        if _server_attempted:
+            return _server
+        _server_attempted = True
+        try:
+            _server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            # Port taken, e.g. by another app process; that process serves its own metrics
+            logger.warning("Metrics exporter not started on %s:%s: %s", host, port, e)
+            return None
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
@@ -0,0 +1,207 @@
+"""Pickle-free storage for linear models.
+
+A ``.lrmodel`` file is a small JSON header followed by raw little-endian
+arrays::
+
+    b"LRMODEL\\0" | uint32 header length | JSON header | padding | arrays...
+
+The header records the format version, model type, classes, feature names
+and the dtype/shape/offset of every array. Arrays start on 64-byte
+boundaries so files above MMAP_THRESHOLD can be memory-mapped instead of
+read. Loading needs NumPy and SciPy only; no code from the file is ever
+executed and the sklearn version the model was trained with doesn't matter.
+
+Usage:
+    python model_format.py export diabetes_model.pkl diabetes_model.lrmodel
+    python model_format.py verify diabetes_model.pkl diabetes_model.lrmodel
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+# sklearn's own sigmoid: a NumPy 1/(1+exp(-x)) differs from it by one ulp for
+# ~2% of inputs, which would break exact parity with predict_proba
+from scipy.special import expit
+
+from features import FEATURE_BOUNDS
+
+EXTENSION = ".lrmodel"
+FORMAT_VERSION = 1
+MAGIC = b"LRMODEL\0"
+MMAP_THRESHOLD = 1 << 20
+_ALIGN = 64
+_HEADER_LEN = struct.Struct("<I")
+
+
+class ModelFormatError(ValueError):
+    pass
+
+
+class LinearModel:
+    """Binary logistic regression restored from a ``.lrmodel`` file.
+
+    Exposes the attributes and methods of sklearn's LogisticRegression that
+    the rest of the app uses, with the same arithmetic.
+    """
+
+    def __init__(self, coef, intercept, classes, feature_names):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = classes
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = coef.shape[1]
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return (X @ self.coef_.T + self.intercept_).reshape(-1)
+
+    def predict_proba(self, X):
+        prob = expit(self.decision_function(X))
+        return np.stack([1 - prob, prob], axis=1)
+
+    def predict(self, X):
+        return self.classes_.take((self.decision_function(X) > 0).astype(np.intp))
+
+
+def _pad(offset):
+    return -offset % _ALIGN
+
+
+def export_model(model, path):
+    """Write a fitted binary logistic regression to ``path``."""
+    coef = np.asarray(getattr(model, "coef_", None))
+    classes = np.asarray(getattr(model, "classes_", ()))
+    if coef.ndim != 2 or coef.shape[0] != 1 or len(classes) != 2:
+        raise ModelFormatError(f"Only binary linear models can be exported, not {type(model).__name__}")
+    if getattr(model, "multi_class", "auto") == "multinomial":
+        raise ModelFormatError("Multinomial logistic regression can't be exported")
+    if classes.dtype.kind not in "iub":
+        raise ModelFormatError(f"Class labels must be integers, not {classes.dtype}")
+
+    names = getattr(model, "feature_names_in_", None)
+    arrays = {
+        "coef": np.ascontiguousarray(coef, dtype="<f8"),
+        "intercept": np.ascontiguousarray(model.intercept_, dtype="<f8"),
+    }
+    header = {
+        "format_version": FORMAT_VERSION,
+        "model_type": "binary_logistic_regression",
+        "classes": classes.tolist(),
+        "feature_names": None if names is None else [str(name) for name in names],
+        "arrays": {},
+    }
+
+    # Offsets are relative to the start of the data section
+    offset = 0
+    for name, array in arrays.items():
+        offset += _pad(offset)
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header, sort_keys=True).encode()
+    prefix = len(MAGIC) + _HEADER_LEN.size + len(header_bytes)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as file:
+        file.write(MAGIC)
+        file.write(_HEADER_LEN.pack(len(header_bytes)))
+        file.write(header_bytes)
+        file.write(b"\0" * _pad(prefix))
+        position = 0
+        for name, array in arrays.items():
+            padding = header["arrays"][name]["offset"] - position
+            file.write(b"\0" * padding)
+            file.write(array.tobytes())
+            position += padding + array.nbytes
+    os.replace(tmp, path)
+
+
+def read_header(path):
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ModelFormatError(f"{path} is not a {EXTENSION} file")
+        (length,) = _HEADER_LEN.unpack(file.read(_HEADER_LEN.size))
+        header = json.loads(file.read(length))
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ModelFormatError(f"Unsupported {EXTENSION} format version {header.get('format_version')}")
+    prefix = len(MAGIC) + _HEADER_LEN.size + length
+    return header, prefix + _pad(prefix)
+
+
+def load_model(path, mmap=None):
+    """Load a ``.lrmodel`` file. Large files are memory-mapped unless ``mmap=False``."""
+    header, data_start = read_header(path)
+    if header["model_type"] != "binary_logistic_regression":
+        raise ModelFormatError(f"Unknown model type {header['model_type']!r}")
+    if mmap is None:
+        mmap = os.path.getsize(path) >= MMAP_THRESHOLD
+
+    arrays = {}
+    with open(path, "rb") as file:
+        for name, spec in header["arrays"].items():
+            dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+            offset = data_start + spec["offset"]
+            if mmap:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+            else:
+                file.seek(offset)
+                array = np.fromfile(file, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+                array.flags.writeable = False
+                arrays[name] = array
+
+    names = header["feature_names"]
+    if names is None:
+        from features import FEATURE_NAMES
+        names = FEATURE_NAMES
+    return LinearModel(arrays["coef"], arrays["intercept"], np.asarray(header["classes"]), names)
+
+
+def reference_inputs(rows=10_000, seed=0):
+    """Random rows spanning every feature's input range, for equivalence checks."""
+    rng = np.random.default_rng(seed)
+    low, high = np.array(list(FEATURE_BOUNDS.values()), dtype=np.float64).T
+    return rng.uniform(low, high, size=(rows, len(low)))
+
+
+def verify(original, restored, X=None):
+    """Check that two models give identical predictions and probabilities on ``X``."""
+    X = reference_inputs() if X is None else X
+    if not np.array_equal(original.predict(X), restored.predict(X)):
+        raise ModelFormatError("Round trip changed predicted classes")
+    difference = np.abs(original.predict_proba(X) - restored.predict_proba(X)).max()
+    if difference != 0:
+        raise ModelFormatError(f"Round trip changed probabilities by up to {difference:.3g}")
+    return len(X)
+
+
+def _load_pickle(path):
+    import pickle
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in ("export", "verify"):
+        sub = commands.add_parser(command)
+        sub.add_argument("pickle", help="trusted sklearn model pickle")
+        sub.add_argument("output", help=f"{EXTENSION} file")
+    args = parser.parse_args(argv)
+
+    try:
+        original = _load_pickle(args.pickle)
+        if args.command == "export":
+            export_model(original, args.output)
+        rows = verify(original, load_model(args.output))
+    except (OSError, ModelFormatError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.output}: identical to {args.pickle} on {rows:,} reference rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
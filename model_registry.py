@@ -0,0 +1,326 @@
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import metrics
+import model_format
+from config import MODEL_MMAP, MODEL_PATH, MODEL_POLL_INTERVAL, MODEL_REGISTRY_DIR
+from explain import make_explainer
+from inference import compile_model
+from preview import make_preview
+
+logger = logging.getLogger(__name__)
+
+# Streamlit re-executes app.py on every widget interaction, but imported modules
+# stay loaded for the lifetime of the server process. Keeping the loaded models
+# here means every artifact is deserialized once and shared by all sessions.
+_lock = threading.Lock()
+_entries = {}
+
+# The entry new reruns and requests are served from. It is replaced by a single
+# assignment, so anyone already holding the previous entry finishes with it.
+_active = None
+_watcher = None
+
+# Artifact names inside a version directory, in order of preference
+ARTIFACT_NAMES = ("model" + model_format.EXTENSION, "model.pkl")
+POINTER_NAME = "CURRENT"
+_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class ModelEntry:
+    """A loaded model, its compiled scorer, explainer and live preview, and the file state it was loaded from."""
+
+    __slots__ = ("path", "version", "model", "scorer", "explainer", "preview", "mtime_ns", "size", "sha256")
+
+    def __init__(self, path, version, model, mtime_ns, size, sha256):
+        self.path = path
+        self.version = version or f"sha-{sha256[:12]}"
+        self.model = model
+        self.scorer = compile_model(model)
+        self.explainer = make_explainer(self.scorer)
+        self.preview = make_preview(self.scorer)
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha256 = sha256
+
+    def matches(self, stat):
+        return self.mtime_ns == stat.st_mtime_ns and self.size == stat.st_size
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load(path):
+    if path.endswith(model_format.EXTENSION):
+        return model_format.load_model(path, mmap=MODEL_MMAP)
+    # Pickles can run arbitrary code; only load ones you produced yourself
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def _warm_up(scorer):
+    # Run one throwaway prediction so the first real request doesn't pay for
+    # lazy initialisation inside sklearn/numpy.
+    scorer.predict(np.zeros((1, len(scorer.feature_names))))
+
+
+def load_entry(path, version=None):
+    """Return the cached entry for ``path``, (re)loading it only if the file changed.
+
+    The common case is a single ``os.stat`` call. The file is only hashed when
+    its mtime or size moved, and only deserialized when the content differs.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    entry = _entries.get(path)
+    if entry is not None and entry.matches(stat):
+        return entry
+
+    with _lock:
+        entry = _entries.get(path)
+        if entry is not None and entry.matches(stat):
+            return entry
+
+        sha256 = file_digest(path)
+        if entry is not None and entry.sha256 == sha256:
+            # File was touched but its content is the same
+            entry.mtime_ns = stat.st_mtime_ns
+            entry.size = stat.st_size
+            return entry
+
+        # Deserialize, compile and warm up: everything a swap waits for
+        with metrics.timer("model_load"):
+            entry = ModelEntry(path, version, _load(path), stat.st_mtime_ns, stat.st_size, sha256)
+            _warm_up(entry.scorer)
+        _entries[path] = entry
+        return entry
+
+
+# Versioned registry ---------------------------------------------------------
+
+def version_path(version, registry_dir=MODEL_REGISTRY_DIR):
+    directory = os.path.join(registry_dir, version)
+    for name in ARTIFACT_NAMES:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return os.path.join(directory, ARTIFACT_NAMES[0])
+
+
+def list_versions(registry_dir=MODEL_REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(name for name in os.listdir(registry_dir)
+                  if not name.startswith(".") and os.path.isfile(version_path(name, registry_dir)))
+
+
+def active_version(registry_dir=MODEL_REGISTRY_DIR):
+    """Version named by the registry's CURRENT pointer, or None if there isn't one."""
+    try:
+        with open(os.path.join(registry_dir, POINTER_NAME)) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _next_version(registry_dir):
+    numbers = [int(name[1:]) for name in list_versions(registry_dir) if re.fullmatch(r"v\d+", name)]
+    return f"v{max(numbers, default=0) + 1}"
+
+
+def publish(source_path, version=None, registry_dir=MODEL_REGISTRY_DIR):
+    """Copy a model artifact into the registry as a new, immutable version.
+
+    The artifact is loaded and scored once before it becomes visible, and the
+    version directory appears atomically, so a half-copied model is never listed.
+    """
+    os.makedirs(registry_dir, exist_ok=True)
+    version = version or _next_version(registry_dir)
+    if not _VERSION_RE.match(version):
+        raise ValueError(f"Invalid version name {version!r}")
+    target = os.path.join(registry_dir, version)
+    if os.path.exists(target):
+        raise ValueError(f"Version {version!r} already exists")
+
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=registry_dir)
+    try:
+        is_lrmodel = source_path.endswith(model_format.EXTENSION)
+        artifact = os.path.join(staging, ARTIFACT_NAMES[0 if is_lrmodel else 1])
+        shutil.copyfile(source_path, artifact)
+        try:
+            _warm_up(compile_model(_load(artifact)))
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            # Corrupt pickles, or ones referring to classes this environment lacks
+            raise ValueError(f"Can't load {source_path} as a model: {type(e).__name__}: {e}") from e
+        os.chmod(staging, 0o755)
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return version
+
+
+def promote(version, registry_dir=MODEL_REGISTRY_DIR):
+    """Point CURRENT at ``version``. Running processes pick it up on their next poll."""
+    if not os.path.isfile(version_path(version, registry_dir)):
+        raise ValueError(f"Unknown model version {version!r}")
+    fd, tmp = tempfile.mkstemp(prefix=".current-", dir=registry_dir)
+    os.chmod(tmp, 0o644)
+    with os.fdopen(fd, "w") as file:
+        file.write(version + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, os.path.join(registry_dir, POINTER_NAME))
+
+
+def _resolve():
+    """``(version, path)`` of the artifact that should be serving."""
+    version = active_version()
+    if version is None:
+        return None, MODEL_PATH
+    return version, version_path(version)
+
+
+# Hot swap -------------------------------------------------------------------
+
+def _swap(entry):
+    global _active
+    previous = _active
+    _active = entry
+    if previous is not None and previous is not entry:
+        logger.info("Serving model %s (was %s)", entry.version, previous.version)
+        if previous.path != entry.path:
+            # Holders of the old entry keep it alive until they're done
+            with _lock:
+                _entries.pop(previous.path, None)
+
+
+def refresh():
+    """Load the artifact that should be serving, warm it, then make it active."""
+    version, path = _resolve()
+    entry = load_entry(path, version)
+    if entry is not _active:
+        _swap(entry)
+    return entry
+
+
+def _watch(interval):
+    last_error = None
+    while True:
+        time.sleep(interval)
+        try:
+            refresh()
+            last_error = None
+        except Exception as e:
+            # Keep serving the current model if the new one can't be loaded,
+            # and only log a failure once rather than on every poll
+            if repr(e) != last_error:
+                last_error = repr(e)
+                logger.exception("Model refresh failed; still serving %s",
+                                 _active.version if _active is not None else None)
+
+
+def _start_watcher():
+    global _watcher
+    with _lock:
+        if _watcher is None and MODEL_POLL_INTERVAL > 0:
+            _watcher = threading.Thread(target=_watch, args=(MODEL_POLL_INTERVAL,),
+                                        name="model-watcher", daemon=True)
+            _watcher.start()
+
+
+def _after_fork_in_child():
+    # The watcher thread doesn't survive fork(); start a fresh one lazily.
+    # Loaded entries (and mmap'd weights) are inherited and shared.
+    global _lock, _watcher
+    _lock = threading.Lock()
+    _watcher = None
+    if _active is not None:
+        _start_watcher()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_entry(path=None):
+    """The active model entry, or the entry for an explicit artifact ``path``.
+
+    The active entry is a plain attribute read; loading, warming and swapping
+    in a newly promoted or changed model happens on a background thread.
+    """
+    if path is not None:
+        return load_entry(path)
+    entry = _active
+    if entry is None:
+        entry = refresh()
+        _start_watcher()
+    return entry
+
+
+def get_model(path=None):
+    return get_entry(path).model
+
+
+def get_scorer(path=None):
+    return get_entry(path).scorer
+
+
+def clear():
+    global _active
+    with _lock:
+        _entries.clear()
+        _active = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts.")
+    parser.add_argument("--registry", default=MODEL_REGISTRY_DIR, help="registry directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish_cmd = commands.add_parser("publish", help="add a model artifact as a new version")
+    publish_cmd.add_argument("artifact")
+    publish_cmd.add_argument("--version", help="version name (default: next vN)")
+    publish_cmd.add_argument("--promote", action="store_true", help="also make it the active version")
+    promote_cmd = commands.add_parser("promote", help="make a version the active one")
+    promote_cmd.add_argument("version")
+    commands.add_parser("list", help="list versions")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "publish":
+            version = publish(args.artifact, args.version, args.registry)
+            print(f"published {version}")
+            if args.promote:
+                promote(version, args.registry)
+                print(f"promoted {version}")
+        elif args.command == "promote":
+            promote(args.version, args.registry)
+            print(f"promoted {args.version}")
+        else:
+            current = active_version(args.registry)
+            for version in list_versions(args.registry):
+                print(f"{'*' if version == current else ' '} {version}")
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+
+import charts
+import prediction_store
+from config import AUDIT_LOG_ENABLED
+from features import FEATURE_NAMES
+
+st.set_page_config(
+    page_title="Prediction Analytics",
+    page_icon="📈",
+    layout="wide"
+)
+
+st.html('<style>@import url("app/static/styles.css");</style>')
+
+
+def main():
+    st.title("📈 Prediction Analytics")
+    st.markdown("Aggregate views over every prediction recorded in the audit log.")
+    
+    if not AUDIT_LOG_ENABLED:
+        st.warning("The audit log is disabled (DIABETES_AUDIT_LOG=0), so no new predictions are being recorded.")
+    
+    # Only records logged since the last refresh are read and aggregated
+    store, stats, new_rows = prediction_store.refresh()
+    st.caption(f"{store.rows:,} predictions stored, {new_rows:,} added since the last refresh")
+    
+    if store.rows == 0:
+        st.info("No predictions have been recorded yet.")
+        return
+    
+    tab1, tab2, tab3 = st.tabs(["📊 Risk Distribution", "📉 Feature Drift", "🎯 Calibration"])
+    
+    with tab1:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Predictions", f"{stats.rows:,}")
+        col2.metric("Predicted higher risk", f"{stats.positives / stats.rows * 100:.1f}%")
+        mean_probability = stats.mean_probability()
+        col3.metric("Mean risk", "–" if mean_probability is None else f"{mean_probability * 100:.1f}%")
+        
+        edges = np.linspace(0, 100, prediction_store.RISK_BINS + 1)
+        histogram = pd.DataFrame({'risk': edges[:-1], 'risk_end': edges[1:], 'count': stats.risk_counts})
+        st.vega_lite_chart(histogram, charts.risk_histogram_spec(), width='stretch')
+    
+    with tab2:
+        drift = pd.DataFrame(stats.drift())
+        st.markdown("Recent means (last 7 days with data) compared with the data the model was trained on. "
+                    "A shift of more than about one standard deviation is worth a closer look.")
+        st.dataframe(drift.rename(columns={
+            'feature': 'Feature', 'training_mean': 'Training mean', 'mean': 'Mean', 'std': 'Std',
+            'recent_mean': 'Recent mean', 'shift_std': 'Shift (std)'}).round(3), hide_index=True)
+        
+        feature = st.selectbox("Feature", list(FEATURE_NAMES), index=1)
+        j = FEATURE_NAMES.index(feature)
+        trend = pd.DataFrame({
+            'day': pd.to_datetime(stats.days * prediction_store.DAY, unit='s'),
+            'mean': stats.daily_means()[:, j],
+            'count': stats.day_counts[:, j],
+        })
+        st.vega_lite_chart(trend, charts.feature_trend_spec(feature, drift['training_mean'][j]),
+                           width='stretch')
+    
+    with tab3:
+        st.markdown("Upload the observed outcomes as a CSV with an `id` column (the Assessment ID, or the "
+                    "`id` returned by the API) and an `outcome` column (1 = diabetic, 0 = not).")
+        uploaded_file = st.file_uploader("Outcomes file", type=["csv"])
+        if uploaded_file is not None:
+            outcomes = pd.read_csv(uploaded_file, dtype={'id': str})
+            missing = [name for name in ('id', 'outcome') if name not in outcomes.columns]
+            if missing:
+                st.error(f"The file is missing the column(s): {', '.join(missing)}")
+                return
+            result = prediction_store.calibration(store, outcomes['id'].fillna(''),
+                                                  pd.to_numeric(outcomes['outcome'], errors='coerce'))
+            if result['matched'] == 0:
+                st.warning("None of the uploaded ids match a stored prediction with a risk score.")
+                return
+            col1, col2 = st.columns(2)
+            col1.metric("Matched predictions", f"{result['matched']:,} of {len(outcomes):,}")
+            col2.metric("Brier score", f"{result['brier']:.3f}", help="Mean squared error of the risk; lower is better")
+            calibration = pd.DataFrame({'predicted': result['predicted'] * 100,
+                                        'observed': result['observed'] * 100,
+                                        'count': result['count']})
+            st.vega_lite_chart(calibration[calibration['count'] > 0], charts.calibration_spec(),
+                               width='stretch')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from config import PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL
+
+_MISSING = object()
+
+
+class PredictionCache:
+    """Thread-safe LRU cache whose entries also expire ``ttl`` seconds after insertion."""
+
+    def __init__(self, maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires, value = item
+                if expires > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            # Computed outside the lock; concurrent misses on one key both compute
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Shared by every session in the process
+cache = PredictionCache()
+
+metrics.register_collector(lambda: [
+    ("prediction_cache_hits_total", {}, cache.hits),
+    ("prediction_cache_misses_total", {}, cache.misses),
+    ("prediction_cache_entries", {}, len(cache)),
+])
+
+
+def normalize(row):
+    """Hashable key for a feature row; 30 and 30.0 map to the same entry."""
+    return tuple(float(value) for value in row)
+
+
+def predict_one(entry, row):
+    """``(prediction, probability)`` for one row, served from the cache when possible.
+
+    ``entry`` is a model_registry entry; its content hash is part of the key so
+    a reloaded model never serves stale results.
+    """
+    key = (entry.sha256, normalize(row))
+
+    def compute():
+        predictions, probabilities = entry.scorer.predict([key[1]])
+        probability = None if probabilities is None else float(probabilities[0])
+        return predictions[0], probability
+
+    return cache.get_or_compute(key, compute)
@@ -0,0 +1,313 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from audit_log import RECORD_ID_LENGTH
+from config import AUDIT_LOG_DIR, PREDICTION_STORE_DIR
+from features import BACKGROUND_MEAN, FEATURE_NAMES
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+STATE_NAME = "state.json"
+AGGREGATES_NAME = "aggregates.npz"
+RISK_BINS = 20
+CALIBRATION_BINS = 10
+DAY = 86400.0
+
+ID_DTYPE = np.dtype(f"S{RECORD_ID_LENGTH}")
+COLUMNS = dict({"ts": np.dtype(np.float64), "id": ID_DTYPE, "prediction": np.dtype(np.float64),
+                "probability": np.dtype(np.float64)},
+               **{name: np.dtype(np.float64) for name in FEATURE_NAMES})
+
+
+def _prediction_records(lines):
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # A torn write from a crash; the rest of the file is still good
+            continue
+        if isinstance(record, dict) and isinstance(record.get("features"), dict):
+            yield record
+
+
+class PredictionStore:
+    """Append-only columnar copy of the predictions in the audit log.
+
+    Every column is a flat binary file read back with ``np.memmap``, so a
+    query touches only the columns and rows it needs. ``ingest`` picks up
+    where the last call stopped: each audit file's read offset is kept in
+    ``state.json`` (by inode, so it survives log rotation) and only lines
+    appended since are parsed.
+    """
+
+    def __init__(self, directory=PREDICTION_STORE_DIR, log_dir=AUDIT_LOG_DIR):
+        self.directory = directory
+        self.log_dir = log_dir
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    @property
+    def rows(self):
+        return self._state["rows"]
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load_state(self):
+        try:
+            with open(self._path(STATE_NAME)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"rows": 0, "sources": {}}
+
+    def _save_state(self):
+        fd, tmp = tempfile.mkstemp(prefix=".state-", dir=self.directory)
+        with os.fdopen(fd, "w") as file:
+            json.dump(self._state, file)
+        os.replace(tmp, self._path(STATE_NAME))
+
+    def _log_files(self):
+        # Rotated files are older than the live one; read them first
+        rotated = sorted(glob.glob(os.path.join(self.log_dir, "predictions-*.jsonl")))
+        return rotated + [os.path.join(self.log_dir, "predictions.jsonl")]
+
+    def ingest(self):
+        """Copy predictions logged since the last call into the store; returns how many."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(self._path(".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another process may have ingested since we last looked
+            self._state = self._load_state()
+            rows = self._state["rows"]
+            # Drop anything a crashed ingest appended after the last saved state
+            for name, dtype in COLUMNS.items():
+                path = self._path(name + ".bin")
+                if os.path.exists(path) and os.path.getsize(path) > rows * dtype.itemsize:
+                    os.truncate(path, rows * dtype.itemsize)
+
+            sources = {}
+            records = []
+            for path in self._log_files():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                key = f"{stat.st_dev}:{stat.st_ino}"
+                offset = self._state["sources"].get(key, 0)
+                if stat.st_size > offset:
+                    with open(path, "rb") as file:
+                        file.seek(offset)
+                        data = file.read(stat.st_size - offset)
+                    # A line the writer hasn't finished yet is left for next time
+                    end = data.rfind(b"\n") + 1
+                    records.extend(_prediction_records(data[:end].splitlines()))
+                    offset += end
+                sources[key] = offset
+
+            if records:
+                self._append(records)
+            # Offsets of deleted log files are forgotten
+            self._state = {"rows": rows + len(records), "sources": sources}
+            self._save_state()
+            return len(records)
+
+    def _append(self, records):
+        columns = {
+            "ts": [record.get("ts", 0.0) for record in records],
+            "id": [record.get("id") or "" for record in records],
+            "prediction": [record.get("prediction") for record in records],
+            "probability": [record.get("probability") for record in records],
+        }
+        for name in FEATURE_NAMES:
+            columns[name] = [record["features"].get(name) for record in records]
+        for name, values in columns.items():
+            if name != "id":
+                # None (no probability, a feature the model didn't use) becomes NaN
+                values = [np.nan if value is None else value for value in values]
+            with open(self._path(name + ".bin"), "ab") as file:
+                file.write(np.array(values, dtype=COLUMNS[name]).tobytes())
+
+    def column(self, name, start=0, stop=None):
+        """Read-only memory map of rows ``start:stop`` of one column."""
+        stop = self.rows if stop is None else stop
+        dtype = COLUMNS[name]
+        if stop <= start:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._path(name + ".bin"), dtype=dtype, mode="r",
+                         offset=start * dtype.itemsize, shape=(stop - start,))
+
+    def features(self, start=0, stop=None):
+        return np.column_stack([self.column(name, start, stop) for name in FEATURE_NAMES])
+
+
+class CohortStats:
+    """Running aggregates over the store: risk histogram and per-day feature moments.
+
+    ``update`` folds in only the rows added since the last update, and the
+    aggregates are saved next to the store so a restart resumes from them.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.risk_counts = np.zeros(RISK_BINS, dtype=np.int64)
+        self.positives = 0
+        self.probability_sum = 0.0
+        self.days = np.empty(0, dtype=np.int64)
+        self.day_counts = np.empty((0, len(FEATURE_NAMES)), dtype=np.int64)
+        self.day_sums = np.empty((0, len(FEATURE_NAMES)))
+        self.day_sumsq = np.empty((0, len(FEATURE_NAMES)))
+
+    def update(self, store):
+        start, stop = self.rows, store.rows
+        if stop <= start:
+            return 0
+        probability = np.asarray(store.column("probability", start, stop))
+        known = probability[~np.isnan(probability)]
+        self.risk_counts += np.histogram(known, bins=RISK_BINS, range=(0.0, 1.0))[0]
+        self.probability_sum += float(known.sum())
+        self.positives += int(np.count_nonzero(np.asarray(store.column("prediction", start, stop)) == 1))
+
+        # Per-day count, sum and sum of squares of every feature, merged into
+        # the days seen so far
+        X = store.features(start, stop)
+        present = ~np.isnan(X)
+        X = np.where(present, X, 0.0)
+        days = np.floor(np.asarray(store.column("ts", start, stop)) / DAY).astype(np.int64)
+        all_days, inverse = np.unique(np.concatenate([self.days, days]), return_inverse=True)
+        old, new = inverse[:len(self.days)], inverse[len(self.days):]
+        counts = np.zeros((len(all_days), X.shape[1]), dtype=np.int64)
+        sums = np.zeros((len(all_days), X.shape[1]))
+        sumsq = np.zeros((len(all_days), X.shape[1]))
+        counts[old], sums[old], sumsq[old] = self.day_counts, self.day_sums, self.day_sumsq
+        for j in range(X.shape[1]):
+            counts[:, j] += np.bincount(new, present[:, j], minlength=len(all_days)).astype(np.int64)
+            sums[:, j] += np.bincount(new, X[:, j], minlength=len(all_days))
+            sumsq[:, j] += np.bincount(new, X[:, j] * X[:, j], minlength=len(all_days))
+        self.days, self.day_counts, self.day_sums, self.day_sumsq = all_days, counts, sums, sumsq
+        self.rows = stop
+        return stop - start
+
+    @property
+    def scored(self):
+        return int(self.risk_counts.sum())
+
+    def mean_probability(self):
+        return self.probability_sum / self.scored if self.scored else None
+
+    def daily_means(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.day_sums / self.day_counts
+
+    def drift(self, recent_days=7):
+        """Per feature: training mean, overall and recent mean, and the shift of
+        the recent mean from the training mean in overall standard deviations."""
+        counts = self.day_counts.sum(axis=0)
+        recent = self.days > (self.days[-1] - recent_days) if len(self.days) else self.days.astype(bool)
+        recent_counts = self.day_counts[recent].sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.day_sums.sum(axis=0) / counts
+            std = np.sqrt(np.maximum(self.day_sumsq.sum(axis=0) / counts - mean ** 2, 0.0))
+            recent_mean = self.day_sums[recent].sum(axis=0) / recent_counts
+            shift = (recent_mean - np.asarray(BACKGROUND_MEAN)) / std
+        return {
+            "feature": list(FEATURE_NAMES),
+            "training_mean": list(BACKGROUND_MEAN),
+            "mean": mean,
+            "std": std,
+            "recent_mean": recent_mean,
+            "shift_std": shift,
+        }
+
+    def save(self, path):
+        fd, tmp = tempfile.mkstemp(prefix=".aggregates-", suffix=".npz", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as file:
+            np.savez(file, rows=self.rows, risk_counts=self.risk_counts, positives=self.positives,
+                     probability_sum=self.probability_sum, days=self.days, day_counts=self.day_counts,
+                     day_sums=self.day_sums, day_sumsq=self.day_sumsq)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        stats = cls()
+        try:
+            with np.load(path) as saved:
+                stats.rows = int(saved["rows"])
+                stats.risk_counts = saved["risk_counts"]
+                stats.positives = int(saved["positives"])
+                stats.probability_sum = float(saved["probability_sum"])
+                stats.days = saved["days"]
+                stats.day_counts = saved["day_counts"]
+                stats.day_sums = saved["day_sums"]
+                stats.day_sumsq = saved["day_sumsq"]
+        except (FileNotFoundError, KeyError, ValueError):
+            pass
+        return stats
+
+
+def calibration(store, ids, outcomes, bins=CALIBRATION_BINS):
+    """Compare stored probabilities with observed outcomes, matched on prediction id.
+
+    Returns per-bin mean predicted risk, observed rate and count, the Brier
+    score and how many of the uploaded ids were found.
+    """
+    ids = np.asarray(ids, dtype=ID_DTYPE)
+    outcomes = np.asarray(outcomes, dtype=np.float64)
+    order = np.argsort(ids)
+    ids, outcomes = ids[order], outcomes[order]
+
+    stored = np.asarray(store.column("id"))
+    position = np.clip(np.searchsorted(ids, stored), 0, max(len(ids) - 1, 0))
+    matched = (ids[position] == stored) if len(ids) else np.zeros(len(stored), dtype=bool)
+    probability = np.asarray(store.column("probability"))[matched]
+    observed = outcomes[position[matched]]
+    keep = ~np.isnan(probability) & ~np.isnan(observed)
+    probability, observed = probability[keep], observed[keep]
+
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    index = np.clip(np.digitize(probability, edges) - 1, 0, bins - 1)
+    counts = np.bincount(index, minlength=bins)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        predicted = np.bincount(index, probability, minlength=bins) / counts
+        rate = np.bincount(index, observed, minlength=bins) / counts
+    return {
+        "bin_start": edges[:-1],
+        "predicted": predicted,
+        "observed": rate,
+        "count": counts,
+        "matched": len(probability),
+        "brier": float(np.mean((probability - observed) ** 2)) if len(probability) else None,
+    }
+
+
+_store = None
+_stats = None
+_refresh_lock = threading.Lock()
+
+
+def refresh():
+    """Ingest new audit records and fold them into the running aggregates.
+
+    Returns ``(store, stats, new_rows)``; only records logged since the
+    previous refresh are read.
+    """
+    global _store, _stats
+    with _refresh_lock:
+        if _store is None:
+            _store = PredictionStore()
+            _stats = CohortStats.load(os.path.join(_store.directory, AGGREGATES_NAME))
+        new_rows = _store.ingest()
+        if _stats.rows > _store.rows:
+            # The store was reset underneath the saved aggregates
+            _stats = CohortStats()
+        if _stats.update(_store):
+            _stats.save(os.path.join(_store.directory, AGGREGATES_NAME))
+        return _store, _stats, new_rows
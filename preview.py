@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+
+from config import LIVE_PREVIEW_MAX_ERROR
+from features import FEATURE_BOUNDS
+from inference import LinearScorer
+
+
+class LookupPreview:
+    """Approximate risk of a linear model from precomputed, quantized tables.
+
+    A full grid over all inputs would be far too large, but a linear score is
+    a sum of one term per feature, so each feature gets its own table of
+    ``coef * x`` over its input range. An estimate is one gather and a sum.
+
+    Snapping a value to the nearest grid point moves it by at most half a
+    step, which moves the score by at most ``|coef| * step / 2``. The sigmoid's
+    slope is at most 1/4, so with steps of ``8 * max_error / (n * |coef|)`` the
+    estimated probability is within ``max_error`` of the exact one for any
+    input inside the bounds.
+    """
+
+    def __init__(self, scorer, max_error=LIVE_PREVIEW_MAX_ERROR, bounds=FEATURE_BOUNDS):
+        coef = scorer.coef_T.reshape(-1)
+        n_features = len(coef)
+        self.max_error = max_error
+        self.intercept = float(scorer.intercept.reshape(-1)[0])
+        self.low = np.array([bounds[name][0] for name in scorer.feature_names], dtype=np.float64)
+        high = np.array([bounds[name][1] for name in scorer.feature_names], dtype=np.float64)
+        span = high - self.low
+        with np.errstate(divide="ignore"):
+            step = 8 * max_error / (n_features * np.abs(coef))
+        # A feature the model ignores, or one whose whole range fits in a step,
+        # only needs a single entry
+        self.step = np.where(step < span, step, np.maximum(span, 1.0))
+        self.size = np.floor(span / self.step).astype(np.intp) + 2
+        self.offset = np.concatenate(([0], np.cumsum(self.size)[:-1]))
+        # All tables back to back, so a row needs a single gather
+        grid_points = np.concatenate([self.low[j] + np.arange(self.size[j]) * self.step[j]
+                                      for j in range(n_features)])
+        self.table = grid_points * np.repeat(coef, self.size)
+        # Plain-Python copies for single rows, where NumPy's per-call overhead
+        # costs more than the arithmetic
+        self._row_table = self.table.tolist()
+        self._row_params = list(zip(self.low.tolist(), self.step.tolist(),
+                                    (self.size - 1).tolist(), self.offset.tolist()))
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def index(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        cells = np.rint((X - self.low) / self.step).astype(np.intp)
+        return self.offset + np.clip(cells, 0, self.size - 1)
+
+    def probability_row(self, row):
+        score = self.intercept
+        table = self._row_table
+        for x, (low, step, last, offset) in zip(row, self._row_params):
+            cell = round((x - low) / step)
+            score += table[offset + (0 if cell < 0 else last if cell > last else cell)]
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def probability(self, X):
+        """Estimated probability per row of ``X`` (or a float for a single row)."""
+        if np.ndim(X) == 1:
+            return self.probability_row(X)
+        scores = self.intercept + self.table[self.index(X)].sum(axis=-1)
+        return 1.0 / (1.0 + np.exp(-scores))
+
+
+class ExactPreview:
+    """Preview for models without a linear form: runs the model itself."""
+
+    max_error = 0.0
+    nbytes = 0
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+
+    def probability_row(self, row):
+        return self.probability(np.asarray(row, dtype=np.float64))
+
+    def probability(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        _, probabilities = self.scorer.predict(X.reshape(-1, X.shape[-1]))
+        if probabilities is None:
+            return None
+        return float(probabilities[0]) if X.ndim == 1 else probabilities
+
+
+def make_preview(scorer, max_error=LIVE_PREVIEW_MAX_ERROR):
+    if isinstance(scorer, LinearScorer) and all(name in FEATURE_BOUNDS for name in scorer.feature_names):
+        return LookupPreview(scorer, max_error)
+    return ExactPreview(scorer)
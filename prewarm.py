@@ -0,0 +1,40 @@
+import importlib
+import threading
+
+from config import PREWARM
+
+# Modules that are only needed once a prediction is shown or a file is
+# uploaded. They are kept out of the startup path and imported here instead.
+DEFERRED_MODULES = (
+    "pandas",
+    "charts",
+    "batch_scoring",
+)
+
+_lock = threading.Lock()
+_started = False
+
+
+def _import_all(modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # The code path that needs it will report the error properly
+            pass
+
+
+def start(modules=DEFERRED_MODULES):
+    """Import ``modules`` in a daemon thread, once per process.
+
+    Python's per-module import locks make this safe to race with the script
+    thread importing the same module on first use.
+    """
+    global _started
+    with _lock:
+        if _started or not PREWARM:
+            return None
+        _started = True
+    thread = threading.Thread(target=_import_all, args=(modules,), name="prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,70 @@
+import numpy as np
+
+import shared_tables
+from features import FEATURE_BOUNDS
+from prediction_cache import PredictionCache
+
+CURVE_POINTS = 61
+HEATMAP_POINTS = 41
+
+# Sweeps are keyed on the model version and the base vector, so reruns and
+# switching between features only compute each grid once. With shared tables
+# configured, worker processes also reuse each other's sweeps via mmap'd files.
+_cache = PredictionCache(maxsize=512, ttl=3600)
+_shared = shared_tables.default_tables()
+
+
+def feature_grid(feature_name, points):
+    low, high = FEATURE_BOUNDS[feature_name]
+    grid = np.linspace(low, high, points)
+    grid.flags.writeable = False
+    return grid
+
+
+def _sweep_1d(scorer, base, index, points):
+    X = np.tile(np.asarray(base, dtype=np.float64), (points, 1))
+    X[:, index] = feature_grid(scorer.feature_names[index], points)
+    _, probabilities = scorer.predict(X)
+    return probabilities
+
+
+def _sweep_2d(scorer, base, index_x, index_y, points):
+    grid_x = feature_grid(scorer.feature_names[index_x], points)
+    grid_y = feature_grid(scorer.feature_names[index_y], points)
+    X = np.tile(np.asarray(base, dtype=np.float64), (points * points, 1))
+    # Row-major: y varies slowest, so the result reshapes to (len(grid_y), len(grid_x))
+    X[:, index_x] = np.tile(grid_x, points)
+    X[:, index_y] = np.repeat(grid_y, points)
+    _, probabilities = scorer.predict(X)
+    return probabilities.reshape(points, points)
+
+
+def _cached(key, compute):
+    def load():
+        if _shared is not None:
+            return _shared.get_or_compute(key, compute)
+        table = compute()
+        table.flags.writeable = False
+        return table
+    return _cache.get_or_compute(key, load)
+
+
+def risk_curve(scorer, model_version, base, index, points=CURVE_POINTS):
+    """Risk as feature ``index`` moves over its input range, others held at ``base``.
+
+    Returns ``(grid, probabilities)``; all points are scored in one call.
+    """
+    base = tuple(float(value) for value in base)
+    key = ("1d", model_version, base, index, points)
+    probabilities = _cached(key, lambda: _sweep_1d(scorer, base, index, points))
+    return feature_grid(scorer.feature_names[index], points), probabilities
+
+
+def risk_surface(scorer, model_version, base, index_x, index_y, points=HEATMAP_POINTS):
+    """Risk over a grid of two features; returns ``(grid_x, grid_y, probabilities[y, x])``."""
+    base = tuple(float(value) for value in base)
+    key = ("2d", model_version, base, index_x, index_y, points)
+    probabilities = _cached(key, lambda: _sweep_2d(scorer, base, index_x, index_y, points))
+    return (feature_grid(scorer.feature_names[index_x], points),
+            feature_grid(scorer.feature_names[index_y], points),
+            probabilities)
@@ -0,0 +1,237 @@
+"""Run several worker processes that share one listening port and one model.
+
+Usage:
+    python serve.py --workers 4 --port 8502 [--reuse-port]    # the JSON API
+    python serve.py --app --workers 4 --port 8501              # the Streamlit app
+
+API: the model is loaded and warmed once in the supervisor before forking,
+so workers start instantly and share its memory. Workers either accept() on
+the supervisor's socket or, with --reuse-port, each bind their own
+SO_REUSEPORT socket so the kernel balances connections between them.
+
+App: Streamlit runs its own server and keeps each browser session's state
+in the process that serves its websocket, so it can't share a socket. The
+supervisor starts one ``streamlit run`` per worker on the ports after
+--port (8502, 8503, ... here) and proxies --port to them with client-IP
+affinity, so a browser always reaches the same worker. Behind a real load
+balancer, point it at the worker ports with sticky sessions (e.g. nginx
+``ip_hash``) and run with --no-proxy.
+
+Either way .lrmodel weights are memory-mapped (one copy in the page cache
+for all workers), precomputed tables go to a shared directory of mmap'd
+files, and crashed workers are restarted. POSIX only.
+"""
+import os
+
+# Set before the app modules read their configuration
+os.environ.setdefault("DIABETES_MODEL_MMAP", "1")
+os.environ.setdefault("DIABETES_SHARED_TABLES_DIR",
+                      os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else "/tmp", "diabetes-tables"))
+
+import argparse
+import asyncio
+import signal
+import socket
+import subprocess
+import sys
+import time
+import zlib
+
+import model_registry
+from api import DEFAULT_PORT, make_app
+from config import BASE_DIR, METRICS_PORT
+
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+DEFAULT_APP_PORT = 8501
+PROXY_BUFFER = 64 * 1024
+
+
+def bind_socket(host, port, reuse_port=False, listen=True):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    if listen:
+        sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock, host, port, reuse_port):
+    import uvicorn
+
+    if reuse_port:
+        sock = bind_socket(host, port, reuse_port=True)
+    server = uvicorn.Server(uvicorn.Config(make_app(), log_level="warning", access_log=False))
+    asyncio.run(server.serve(sockets=[sock]))
+
+
+def _spawn(sock, host, port, reuse_port):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            _run_worker(sock, host, port, reuse_port)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(workers, host="127.0.0.1", port=DEFAULT_PORT, reuse_port=False):
+    if not hasattr(os, "fork"):
+        raise SystemExit("serve.py needs fork(); run api.py directly on this platform")
+
+    # Load and warm once; forked workers inherit the loaded entry
+    entry = model_registry.get_entry()
+    if reuse_port:
+        # Reserve the port without listening, so only workers receive connections
+        sock = bind_socket(host, port, reuse_port=True, listen=False)
+    else:
+        sock = bind_socket(host, port)
+
+    children = {_spawn(sock, host, port, reuse_port) for _ in range(workers)}
+    print(f"Serving model {entry.version} on http://{host}:{port} with {workers} workers "
+          f"({'SO_REUSEPORT' if reuse_port else 'shared socket'})", flush=True)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"worker {pid} exited with status {status}; restarting", file=sys.stderr, flush=True)
+            time.sleep(0.5)
+            children.add(_spawn(sock, host, port, reuse_port))
+
+    sock.close()
+
+
+# Streamlit app ------------------------------------------------------------
+
+def _start_app_worker(index, port):
+    env = dict(os.environ)
+    if METRICS_PORT:
+        # Each worker exports its own metrics
+        env["DIABETES_METRICS_PORT"] = str(METRICS_PORT + index)
+    return subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.port", str(port),
+         "--server.address", "127.0.0.1", "--server.headless", "true"],
+        cwd=BASE_DIR, env=env, stdin=subprocess.DEVNULL)
+
+
+async def _pipe(reader, writer):
+    try:
+        while data := await reader.read(PROXY_BUFFER):
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def _backend_for(peer, ports):
+    # Same client IP, same worker: its session state lives in that process
+    return ports[zlib.crc32(peer[0].encode()) % len(ports)]
+
+
+async def _proxy(host, port, ports, processes):
+    async def handle(client_reader, client_writer):
+        backend = _backend_for(client_writer.get_extra_info("peername"), ports)
+        try:
+            backend_reader, backend_writer = await asyncio.open_connection("127.0.0.1", backend)
+        except OSError:
+            client_writer.close()
+            return
+        await asyncio.gather(_pipe(client_reader, backend_writer), _pipe(backend_reader, client_writer))
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await _supervise_app(ports, processes)
+
+
+async def _supervise_app(ports, processes):
+    while True:
+        for index, process in enumerate(processes):
+            if process.poll() is not None:
+                print(f"app worker on port {ports[index]} exited with status {process.returncode}; "
+                      "restarting", file=sys.stderr, flush=True)
+                processes[index] = _start_app_worker(index, ports[index])
+        await asyncio.sleep(1.0)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve_app(workers, host="127.0.0.1", port=DEFAULT_APP_PORT, proxy=True):
+    # Fail here, once, rather than in every worker
+    model_registry.get_entry()
+    # SIGTERM stops the workers too, like Ctrl-C
+    signal.signal(signal.SIGTERM, _interrupt)
+    ports = [port + 1 + i for i in range(workers)]
+    processes = [_start_app_worker(i, worker_port) for i, worker_port in enumerate(ports)]
+    if proxy:
+        print(f"Serving the app on http://{host}:{port} with {workers} workers "
+              f"(ports {ports[0]}-{ports[-1]})", flush=True)
+    else:
+        print(f"App workers on 127.0.0.1 ports {ports[0]}-{ports[-1]}; "
+              "balance them with sticky sessions", flush=True)
+    try:
+        if proxy:
+            asyncio.run(_proxy(host, port, ports, processes))
+        else:
+            asyncio.run(_supervise_app(ports, processes))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int,
+                        help=f"listening port (default: {DEFAULT_PORT}, or {DEFAULT_APP_PORT} with --app)")
+    parser.add_argument("--reuse-port", action="store_true",
+                        help="give each API worker its own SO_REUSEPORT socket (Linux/BSD)")
+    parser.add_argument("--app", action="store_true", help="run Streamlit app workers instead of the API")
+    parser.add_argument("--no-proxy", action="store_true",
+                        help="with --app, only start the workers; balance them with your own proxy")
+    args = parser.parse_args(argv)
+    if args.app:
+        serve_app(args.workers, args.host, args.port or DEFAULT_APP_PORT, proxy=not args.no_proxy)
+    else:
+        serve(args.workers, args.host, args.port or DEFAULT_PORT, args.reuse_port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import sys
+import threading
+import time
+
+import metrics
+from config import SESSION_IDLE_TIMEOUT
+
+# How often (seconds) an access may trigger a sweep for idle sessions
+_SWEEP_INTERVAL = 60.0
+
+
+class SessionResult:
+    """The last assessment of one session, kept as plain Python scalars."""
+
+    __slots__ = ("features", "prediction", "probability", "model_version", "last_seen", "record_id")
+
+    def __init__(self, features, prediction, probability, model_version, last_seen, record_id=None):
+        self.features = features
+        self.prediction = prediction
+        self.probability = probability
+        self.model_version = model_version
+        self.last_seen = last_seen
+        # Audit log id of the prediction, if it was logged
+        self.record_id = record_id
+
+    def nbytes(self):
+        # model_version is shared with the registry entry, so it isn't counted
+        size = sys.getsizeof(self) + sys.getsizeof(self.features)
+        size += sum(sys.getsizeof(value) for value in self.features)
+        size += sys.getsizeof(self.prediction) + sys.getsizeof(self.probability)
+        if self.record_id is not None:
+            size += sys.getsizeof(self.record_id)
+        return size
+
+
+def _scalar(value):
+    return value.item() if hasattr(value, "item") else value
+
+
+class SessionStore:
+    """Process-wide map of session id to its SessionResult, with idle expiry.
+
+    Kept out of ``st.session_state`` so each session only costs one small
+    record, and results of abandoned sessions are dropped after
+    ``idle_timeout`` seconds instead of living as long as the session object.
+    """
+
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT, clock=time.monotonic):
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._results = {}
+        self._lock = threading.Lock()
+        self._next_sweep = clock() + _SWEEP_INTERVAL
+
+    def get(self, session_id):
+        now = self._clock()
+        self._maybe_sweep(now)
+        with self._lock:
+            result = self._results.get(session_id)
+            if result is None:
+                return None
+            if now - result.last_seen > self.idle_timeout:
+                del self._results[session_id]
+                return None
+            result.last_seen = now
+            return result
+
+    def put(self, session_id, features, prediction, probability, model_version):
+        now = self._clock()
+        result = SessionResult(tuple(float(value) for value in features), _scalar(prediction),
+                               None if probability is None else float(probability), model_version, now)
+        with self._lock:
+            self._results[session_id] = result
+        self._maybe_sweep(now)
+        return result
+
+    def discard(self, session_id):
+        with self._lock:
+            self._results.pop(session_id, None)
+
+    def expire(self, now=None):
+        """Drop every result idle for longer than ``idle_timeout``; return how many."""
+        now = self._clock() if now is None else now
+        with self._lock:
+            stale = [sid for sid, r in self._results.items() if now - r.last_seen > self.idle_timeout]
+            for sid in stale:
+                del self._results[sid]
+        return len(stale)
+
+    def _maybe_sweep(self, now):
+        if now >= self._next_sweep:
+            self._next_sweep = now + _SWEEP_INTERVAL
+            self.expire(now)
+
+    def __len__(self):
+        return len(self._results)
+
+    def footprint(self):
+        """Approximate memory held by the stored results."""
+        with self._lock:
+            results = list(self._results.values())
+        total = sum(result.nbytes() for result in results)
+        return {
+            "sessions": len(results),
+            "bytes": total,
+            "bytes_per_session": total / len(results) if results else 0.0,
+        }
+
+
+# Shared by every session in the process
+store = SessionStore()
+
+metrics.register_collector(lambda: [("session_results", {}, len(store))])
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from config import SHARED_TABLES_DIR, SHARED_TABLES_MAX_FILES
+
+
+class SharedTables:
+    """Read-only NumPy arrays shared between processes as memory-mapped .npy files.
+
+    The first process to compute a table writes it (atomically); every other
+    process maps the same file, so the data sits in the page cache once
+    instead of once per worker. At most ``max_files`` tables are kept; the
+    least recently used are removed first. Processes that still map a removed
+    file keep their mapping.
+    """
+
+    def __init__(self, directory, max_files=SHARED_TABLES_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        name = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            table = np.load(path, mmap_mode="r")
+            # Touch it, so pruning removes the least recently used tables first
+            os.utime(path)
+            return table
+        except (FileNotFoundError, ValueError):
+            # Missing, or a foreign/corrupt file: treat as not cached
+            return None
+
+    def put(self, key, array):
+        path = self._path(key)
+        # Not .npy, so pruning never removes another process's file mid-write
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                np.save(file, np.ascontiguousarray(array))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        table = np.load(path, mmap_mode="r")
+        self._prune()
+        return table
+
+    def _prune(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_files:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get_or_compute(self, key, compute):
+        table = self.get(key)
+        if table is None:
+            table = self.put(key, compute())
+        return table
+
+
+def default_tables():
+    """The configured shared table store, or None when DIABETES_SHARED_TABLES_DIR isn't set."""
+    return SharedTables(SHARED_TABLES_DIR) if SHARED_TABLES_DIR else None
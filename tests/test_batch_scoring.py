@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch_scoring
+import model_registry
+from features import BACKGROUND_MEAN, FEATURE_NAMES
+
+pytest.importorskip("pyarrow")
+
+
+def _patients(rows):
+    frame = pd.DataFrame([BACKGROUND_MEAN] * rows, columns=FEATURE_NAMES)
+    # Whole-number columns, as in a typical export
+    for name in ("Pregnancies", "Glucose", "BloodPressure", "Age"):
+        frame[name] = frame[name].round().astype(int)
+    return frame
+
+
+def test_csv_to_parquet_with_bad_row_in_later_chunk(tmp_path):
+    frame = _patients(12).astype(object)
+    frame.loc[8, "Glucose"] = "abc"  # non-numeric cell, only in the second chunk
+    frame.loc[11, "Age"] = np.nan  # blank cell in an int column, third chunk
+    source = tmp_path / "in.csv"
+    frame.to_csv(source, index=False)
+    target = tmp_path / "out.parquet"
+    rejected = tmp_path / "out.rejected.parquet"
+
+    report = batch_scoring.score_file(str(source), str(target), model_registry.get_scorer(),
+                                      chunksize=5, rejected_output=str(rejected))
+
+    assert (report.rows, report.rejected, report.chunks) == (10, 2, 3)
+    scored = pd.read_parquet(target)
+    assert len(scored) == 10
+    assert scored["probability"].between(0, 1).all()
+    bad = pd.read_parquet(rejected)
+    assert len(bad) == 2
+    assert bad["Glucose"].isna().tolist() == [True, False]
+    assert bad["errors"].str.contains("Glucose").tolist() == [True, False]
+    assert bad["errors"].str.contains("Age").tolist() == [False, True]
@@ -0,0 +1,101 @@
+from functools import lru_cache
+
+import numpy as np
+
+from features import FEATURE_BOUNDS, REQUIRED_FEATURES
+
+# Problem flags, OR-ed together per cell
+NOT_A_NUMBER = 1
+BELOW_MIN = 2
+ABOVE_MAX = 4
+NOT_POSITIVE = 8
+
+
+class Schema:
+    """Allowed range of every model input, as arrays in the model's column order.
+
+    Built from the model's feature names and the input bounds of the app's
+    widgets, so the form, batch files and the API all accept the same values.
+    Features without known bounds accept any finite number.
+    """
+
+    __slots__ = ("feature_names", "low", "high", "required")
+
+    def __init__(self, feature_names, bounds=FEATURE_BOUNDS, required=REQUIRED_FEATURES):
+        self.feature_names = tuple(feature_names)
+        limits = [bounds.get(name, (-np.inf, np.inf)) for name in self.feature_names]
+        self.low = np.array([low for low, _ in limits], dtype=np.float64)
+        self.high = np.array([high for _, high in limits], dtype=np.float64)
+        self.required = np.array([name in required for name in self.feature_names])
+
+    def check(self, X):
+        """Flag every cell of ``X`` (n_rows, n_features); see ``Validation``."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        # NaN compares False everywhere, so it only ever raises NOT_A_NUMBER
+        flags = np.zeros(X.shape, dtype=np.uint8)
+        flags[~np.isfinite(X)] |= NOT_A_NUMBER
+        with np.errstate(invalid="ignore"):
+            flags[X < self.low] |= BELOW_MIN
+            flags[X > self.high] |= ABOVE_MAX
+            flags[(X <= 0) & self.required] |= NOT_POSITIVE
+        return Validation(self, X, flags)
+
+
+@lru_cache(maxsize=16)
+def schema_for(feature_names):
+    return Schema(feature_names)
+
+
+class Validation:
+    """Result of checking a batch: a per-row ``valid`` mask and per-cell flags.
+
+    Messages are only formatted for the rows that failed, so a clean batch
+    costs a handful of vectorized comparisons.
+    """
+
+    __slots__ = ("schema", "X", "flags", "valid")
+
+    def __init__(self, schema, X, flags):
+        self.schema = schema
+        self.X = X
+        self.flags = flags
+        self.valid = ~flags.any(axis=1)
+
+    @property
+    def all_valid(self):
+        return bool(self.valid.all())
+
+    @property
+    def invalid_rows(self):
+        return np.flatnonzero(~self.valid)
+
+    def _describe(self, j, flag):
+        name = self.schema.feature_names[j]
+        if flag & NOT_A_NUMBER:
+            return f"{name} is missing or not a number"
+        if flag & NOT_POSITIVE:
+            return f"{name} is required and must be greater than 0"
+        if flag & BELOW_MIN:
+            return f"{name} must be at least {self.schema.low[j]:g}"
+        return f"{name} must be at most {self.schema.high[j]:g}"
+
+    def errors(self):
+        """``{row_index: [message, ...]}`` for every invalid row."""
+        report = {}
+        rows, cols = np.nonzero(self.flags)
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            report.setdefault(i, []).append(self._describe(j, int(self.flags[i, j])))
+        return report
+
+    def messages(self):
+        """One "; "-joined message per row, empty for valid rows."""
+        messages = np.full(len(self.flags), "", dtype=object)
+        for i, errors in self.errors().items():
+            messages[i] = "; ".join(errors)
+        return messages
+
+
+def validate(X, feature_names):
+    return schema_for(tuple(feature_names)).check(X)